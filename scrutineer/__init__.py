@@ -11,6 +11,11 @@ __version__ = "1.3.18"
 from .scrutineer import Scrutineer
 from .scrutineer import get_keywords
 from .scrutineer import get_bigrams
+from .scrutineer import iter_cleaned
+from .scrutineer import LanguageCache
+from .scrutineer import preload
+from .aggregate import AuthorAggregator
+from .fetch import Fetcher
 
 
 __all__ = ["scrutineer"]
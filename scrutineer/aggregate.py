@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+    scrutineer.aggregate
+    ~~~~~~~~~
+
+    Running per-author statistics of Scrutineer analyses.
+
+    :copyright: 2022 Rodney Maniego Jr.
+    :license: MIT License
+"""
+
+import os
+from json import dump as jdump
+from json import load as jload
+from math import sqrt
+from tempfile import NamedTemporaryFile
+
+SUBSCORES = ("title", "body", "emojis", "images", "tagging", "tags", "score")
+
+
+class AuthorAggregator:
+    def __init__(self, bins=100):
+        self._bins = int(bins)
+        self._authors = {}
+
+    def update(self, analysis):
+        if not analysis or "score" not in analysis:
+            return
+        author = analysis["author"]
+        fields = self._authors.setdefault(author, {})
+        for field in SUBSCORES:
+            value = analysis.get(field)
+            if isinstance(value, dict):
+                value = value.get("score")
+            if value is None:
+                continue
+            if field not in fields:
+                fields[field] = _new_stats(self._bins)
+            _add(fields[field], float(value), self._bins)
+
+    def merge(self, other):
+        if self._bins != other._bins:
+            raise ValueError("Aggregators must use the same number of bins.")
+        for author, fields in other._authors.items():
+            mine = self._authors.setdefault(author, {})
+            for field, stats in fields.items():
+                if field not in mine:
+                    mine[field] = _new_stats(self._bins)
+                _combine(mine[field], stats)
+        return self
+
+    def authors(self):
+        return list(self._authors)
+
+    def stats(self, author):
+        results = {}
+        for field, stats in self._authors.get(author, {}).items():
+            count = stats["count"]
+            variance = stats["m2"] / (count - 1) if count > 1 else 0
+            results[field] = {
+                "count": count,
+                "mean": stats["mean"],
+                "variance": variance,
+                "stdev": sqrt(variance),
+                "min": stats["min"],
+                "max": stats["max"],
+                "p50": _quantile(stats, 0.5, self._bins),
+                "p90": _quantile(stats, 0.9, self._bins),
+            }
+        return results
+
+    def quantile(self, author, field, q):
+        stats = self._authors.get(author, {}).get(field)
+        if not stats:
+            return None
+        return _quantile(stats, float(q), self._bins)
+
+    def save(self, path):
+        # write then rename, readers never see a partial snapshot
+        directory = os.path.dirname(os.path.abspath(path))
+        with NamedTemporaryFile("w", dir=directory, delete=False) as f:
+            jdump({"bins": self._bins, "authors": self._authors}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f.name, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            snapshot = jload(f)
+        aggregator = cls(bins=snapshot["bins"])
+        aggregator._authors = snapshot["authors"]
+        return aggregator
+
+
+def _new_stats(bins):
+    return {
+        "count": 0,
+        "mean": 0.0,
+        "m2": 0.0,
+        "min": None,
+        "max": None,
+        "histogram": [0] * (bins + 1),
+    }
+
+
+def _add(stats, value, bins):
+    # Welford's online mean and variance
+    stats["count"] += 1
+    delta = value - stats["mean"]
+    stats["mean"] += delta / stats["count"]
+    stats["m2"] += delta * (value - stats["mean"])
+    stats["min"] = value if stats["min"] is None else min(stats["min"], value)
+    stats["max"] = value if stats["max"] is None else max(stats["max"], value)
+    stats["histogram"][_bin(value, bins)] += 1
+
+
+def _combine(stats, other):
+    # Chan's parallel update
+    count = stats["count"] + other["count"]
+    if not other["count"]:
+        return
+    delta = other["mean"] - stats["mean"]
+    stats["m2"] += other["m2"] + delta**2 * stats["count"] * other["count"] / count
+    stats["mean"] += delta * other["count"] / count
+    stats["count"] = count
+    for key, pick in (("min", min), ("max", max)):
+        values = [v for v in (stats[key], other[key]) if v is not None]
+        stats[key] = pick(values)
+    stats["histogram"] = [a + b for a, b in zip(stats["histogram"], other["histogram"])]
+
+
+def _bin(value, bins):
+    # sub-scores are ratios within 0 and 1
+    return min(bins, max(0, int(value * bins)))
+
+
+def _quantile(stats, q, bins):
+    if not stats["count"]:
+        return None
+    rank = q * stats["count"]
+    cumulative = 0
+    for i, count in enumerate(stats["histogram"]):
+        cumulative += count
+        if cumulative >= rank and count:
+            value = min(1.0, (i + 0.5) / bins)
+            return min(stats["max"], max(stats["min"], value))
+    return stats["max"]
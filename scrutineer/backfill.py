@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+    scrutineer.backfill
+    ~~~~~~~~~
+
+    Checkpointed, resumable re-scoring of historical Hive Posts.
+
+    :copyright: 2022 Rodney Maniego Jr.
+    :license: MIT License
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from json import dump as jdump
+from json import dumps as jdumps
+from json import load as jload
+from json import loads as jloads
+from tempfile import NamedTemporaryFile
+
+from .fetch import Fetcher
+from .scrutineer import Scrutineer
+
+
+class Backfill:
+    def __init__(
+        self,
+        start,
+        end,
+        directory,
+        fetcher=None,
+        shard_size=10000,
+        batch_size=100,
+        workers=4,
+        weights=None,
+        **options,
+    ):
+        # blocks from start up to, but excluding, end
+        self._start = int(start)
+        self._end = int(end)
+        self._directory = directory
+        self._fetcher = fetcher or Fetcher()
+        self._shard_size = max(1, int(shard_size))
+        self._batch_size = max(1, int(batch_size))
+        self._workers = max(1, int(workers))
+        self._weights = weights or {}
+        self._options = options
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def between(cls, since, until, directory, fetcher=None, **kwargs):
+        fetcher = fetcher or Fetcher()
+        head = fetcher.get_head_block()
+        start = _block_at(fetcher, since, head)
+        end = _block_at(fetcher, until, head)
+        return cls(start, end, directory, fetcher=fetcher, **kwargs)
+
+    def shards(self):
+        return [
+            (n, min(self._end, n + self._shard_size))
+            for n in range(self._start, self._end, self._shard_size)
+        ]
+
+    def run(self):
+        jobs = [
+            (
+                self._directory,
+                start,
+                end,
+                self._fetcher,
+                self._batch_size,
+                self._options,
+                self._weights,
+            )
+            for start, end in self.shards()
+        ]
+        if self._workers == 1:
+            return [_run_shard(*job) for job in jobs]
+        with ProcessPoolExecutor(self._workers) as executor:
+            return list(executor.map(_run_shard, *zip(*jobs)))
+
+    def progress(self):
+        shards = self.shards()
+        done = 0
+        for start, end in shards:
+            checkpoint = _load_checkpoint(_paths(self._directory, start, end)[0], start)
+            done += checkpoint["next"] - start
+        return done / max(1, self._end - self._start)
+
+    def results(self):
+        # analyses of finished batches, in block order
+        for start, end in self.shards():
+            checkpoint_path, output_path = _paths(self._directory, start, end)
+            checkpoint = _load_checkpoint(checkpoint_path, start)
+            if not os.path.exists(output_path):
+                continue
+            with open(output_path, "rb") as f:
+                read = 0
+                for line in f:
+                    read += len(line)
+                    if read > checkpoint["offset"]:
+                        break
+                    yield jloads(line)
+
+
+def _run_shard(directory, start, end, fetcher, batch_size, options, weights):
+    checkpoint_path, output_path = _paths(directory, start, end)
+    checkpoint = _load_checkpoint(checkpoint_path, start)
+    if checkpoint["done"]:
+        return checkpoint
+
+    analyzer = Scrutineer(fetcher=fetcher, **options)
+    analyzer.set_weights(**weights)
+    mode = "r+b" if os.path.exists(output_path) else "w+b"
+    with open(output_path, mode) as output:
+        # drop anything written after the last checkpoint
+        output.truncate(checkpoint["offset"])
+        output.seek(checkpoint["offset"])
+        while checkpoint["next"] < end:
+            count = min(batch_size, end - checkpoint["next"])
+            posts = _new_posts(fetcher.get_blocks(checkpoint["next"], count))
+            # listed authors are not fetched, so their edits can't be told apart
+            posts = [post for post in posts if not analyzer._held(post[2])]
+            fetched = analyzer.fetch_batch([(a, p) for _, _, a, p in posts])
+            # an edit is a comment op too, only the block that created a post counts
+            kept = [
+                (block, post)
+                for (block, stamp, _, _), post in zip(posts, fetched)
+                if _created_in(post, stamp)
+            ]
+            analyses = analyzer.analyze_batch([post for _, post in kept])
+            for (block, _), analysis in zip(kept, analyses):
+                if analysis:
+                    line = jdumps({"block": block, "analysis": analysis})
+                    output.write(line.encode("utf-8") + b"\n")
+            output.flush()
+            os.fsync(output.fileno())
+            checkpoint["next"] += count
+            checkpoint["offset"] = output.tell()
+            checkpoint["done"] = checkpoint["next"] >= end
+            _save_checkpoint(checkpoint_path, checkpoint)
+    return checkpoint
+
+
+def _new_posts(blocks):
+    # root posts only, once per block even if edited within it
+    posts = []
+    for block in blocks:
+        number = _block_number(block)
+        seen = set()
+        for transaction in block.get("transactions", []):
+            for operation in transaction.get("operations", []):
+                kind, value = _operation(operation)
+                if kind not in ("comment", "comment_operation"):
+                    continue
+                if value.get("parent_author"):
+                    continue
+                key = (value["author"], value["permlink"])
+                if key not in seen:
+                    seen.add(key)
+                    posts.append((number, block.get("timestamp"), *key))
+    return posts
+
+
+def _created_in(post, stamp):
+    if not post or not post.get("created") or not stamp:
+        return True
+    return _utc(post["created"]) >= _utc(stamp)
+
+
+def _operation(operation):
+    # condenser lists ["comment", {...}], appbase uses {"type": ..., "value": {...}}
+    if isinstance(operation, dict):
+        return operation.get("type"), operation.get("value", {})
+    return operation[0], operation[1]
+
+
+def _block_number(block):
+    if "block_num" in block:
+        return block["block_num"]
+    # the first 4 bytes of a block id are its number
+    return int(block["block_id"][:8], 16)
+
+
+def _block_at(fetcher, when, head):
+    # first block produced at or after the given time
+    when = _utc(when)
+    low, high = 1, head + 1
+    while low < high:
+        middle = (low + high) // 2
+        if _utc(fetcher.get_block_time(middle)) < when:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def _utc(when):
+    if isinstance(when, str):
+        when = datetime.fromisoformat(when)
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return when
+
+
+def _paths(directory, start, end):
+    name = os.path.join(directory, f"shard-{start}-{end}")
+    return name + ".json", name + ".jsonl"
+
+
+def _load_checkpoint(path, start):
+    if not os.path.exists(path):
+        return {"next": start, "offset": 0, "done": False}
+    with open(path, "r", encoding="utf-8") as f:
+        return jload(f)
+
+
+def _save_checkpoint(path, checkpoint):
+    # write then rename, a crash never leaves a partial checkpoint
+    directory = os.path.dirname(os.path.abspath(path))
+    with NamedTemporaryFile("w", dir=directory, delete=False) as f:
+        jdump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f.name, path)
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+    scrutineer.benchmark
+    ~~~~~~~~~
+
+    Accuracy and speed reports on a corpus of Hive Posts.
+
+    :copyright: 2022 Rodney Maniego Jr.
+    :license: MIT License
+"""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from json import dumps as jdumps
+from json import load as jload
+from multiprocessing import get_context
+from time import perf_counter
+from urllib.request import Request, urlopen
+
+from langdetect import DetectorFactory
+
+from .scrutineer import _parse_body, _count_english, _detect_english, preload
+
+
+def load_corpus(path):
+    # a json list of posts or of raw bodies
+    with open(path, "r", encoding="utf-8") as f:
+        corpus = jload(f)
+    return [c["body"] if isinstance(c, dict) else c for c in corpus]
+
+
+def sampling_report(bodies, error=0.05):
+    DetectorFactory.seed = 0
+
+    errors = []
+    full_time, sampled_time = 0, 0
+    for body in bodies:
+        cleaned = _parse_body(body)
+        if not len(cleaned):
+            continue
+        start = perf_counter()
+        full = _count_english(cleaned)
+        full_time += perf_counter() - start
+
+        start = perf_counter()
+        sampled = _count_english(cleaned, sample=True)
+        sampled_time += perf_counter() - start
+
+        length = len(cleaned.split(" "))
+        errors.append(abs(full - sampled) / length)
+
+    count = len(errors)
+    if not count:
+        return {}
+    errors.sort()
+    return {
+        "posts": count,
+        "mean_error": sum(errors) / count,
+        "p95_error": errors[min(count - 1, int(count * 0.95))],
+        "max_error": errors[-1],
+        "within_error": sum(e <= error for e in errors) / count,
+        "full_seconds": full_time,
+        "sampled_seconds": sampled_time,
+        "speedup": full_time / sampled_time if sampled_time else 0,
+    }
+
+
+def load_test(url, posts, concurrency=8, endpoint="/analyze"):
+    # fire the posts at a running scoring service
+    def request(post):
+        data = jdumps({"post": post}).encode("utf-8")
+        start = perf_counter()
+        headers = {"Content-Type": "application/json"}
+        with urlopen(Request(url + endpoint, data=data, headers=headers)) as response:
+            response.read()
+        return perf_counter() - start
+
+    start = perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        latencies = sorted(executor.map(request, posts))
+    elapsed = perf_counter() - start
+
+    count = len(latencies)
+    if not count:
+        return {}
+    return {
+        "requests": count,
+        "seconds": elapsed,
+        "throughput": count / elapsed,
+        "p50": latencies[int(count * 0.5)],
+        "p95": latencies[min(count - 1, int(count * 0.95))],
+        "p99": latencies[min(count - 1, int(count * 0.99))],
+    }
+
+
+def memory_report(workers=4):
+    # per-worker memory after a first detection, with and without preloading
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        return {}
+    report = {"workers": int(workers)}
+    for name, preloaded in (("baseline", False), ("preloaded", True)):
+        # a fresh interpreter per run, so neither inherits the other's models
+        context = get_context("spawn")
+        results = context.Queue()
+        process = context.Process(target=_fork_workers, args=(workers, preloaded, results))
+        process.start()
+        usage = results.get()
+        process.join()
+        count = len(usage)
+        report[name] = {
+            key: sum(u[key] for u in usage) / count / 1048576 for key in usage[0]
+        }
+    report["pss_saved"] = 1 - report["preloaded"]["pss"] / report["baseline"]["pss"]
+    return report
+
+
+def _fork_workers(workers, preloaded, results):
+    if preloaded:
+        preload()
+    context = get_context("fork")
+    barrier = context.Barrier(workers + 1)
+    queue = context.Queue()
+    processes = [
+        context.Process(target=_measure_worker, args=(barrier, queue))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    # workers stay alive until all are measured, so shared pages are split
+    barrier.wait()
+    usage = [queue.get() for _ in processes]
+    barrier.wait()
+    for process in processes:
+        process.join()
+    results.put(usage)
+
+
+def _measure_worker(barrier, queue):
+    _detect_english("measure the language profiles loaded by this worker")
+    barrier.wait()
+    queue.put(_memory_usage())
+    barrier.wait()
+
+
+def _memory_usage():
+    fields = {}
+    with open("/proc/self/smaps_rollup", "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+if __name__ == "__main__":
+    for key, value in sampling_report(load_corpus(sys.argv[1])).items():
+        print(f"{key}: {value}")
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+    scrutineer.export
+    ~~~~~~~~~
+
+    Columnar export of Scrutineer analyses to Arrow or Parquet files.
+
+    :copyright: 2022 Rodney Maniego Jr.
+    :license: MIT License
+"""
+
+from json import dumps as jdumps
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = None
+    pq = None
+
+FORMATS = ("parquet", "arrow")
+
+# mappings stored as json strings, not flattened into a column per key
+JSON_FIELDS = ("title.keywords", "profiles")
+
+
+def _types():
+    subscore = pa.float64()
+    return {
+        "author": pa.string(),
+        "permlink": pa.string(),
+        "url": pa.string(),
+        "node": pa.string(),
+        "deep": pa.int64(),
+        "score": pa.float64(),
+        "degraded": pa.list_(pa.string()),
+        "skipped": pa.bool_(),
+        "prefilter": pa.string(),
+        "profiles": pa.string(),
+        "title": subscore,
+        "body": subscore,
+        "emojis": subscore,
+        "images": subscore,
+        "tagging": subscore,
+        "tags": subscore,
+        "title.title": pa.string(),
+        "title.cleaned": pa.string(),
+        "title.below_min": pa.bool_(),
+        "title.above_max": pa.bool_(),
+        "title.uppercase": pa.float64(),
+        "title.keywords": pa.string(),
+        "title.readability": pa.float64(),
+        "title.keyword_score": pa.float64(),
+        "title.emojis": pa.list_(pa.string()),
+        "title.score": subscore,
+        "body.cleaned": pa.int64(),
+        "body.english": pa.float64(),
+        "body.400+": pa.bool_(),
+        "body.800+": pa.bool_(),
+        "body.score": subscore,
+        "emojis.limit": pa.int64(),
+        "emojis.emojis": pa.list_(pa.string()),
+        "emojis.count": pa.int64(),
+        "emojis.score": subscore,
+        "images.count": pa.int64(),
+        "images.sequences": pa.int64(),
+        "images.score": subscore,
+        "tagging.limit": pa.int64(),
+        "tagging.count": pa.int64(),
+        "tagging.score": subscore,
+        "tags.limit": pa.int64(),
+        "tags.count": pa.int64(),
+        "tags.score": subscore,
+    }
+
+
+class ArrowSink:
+    def __init__(self, path, format="parquet", chunk_size=10000):
+        if pa is None:
+            raise ImportError("ArrowSink requires pyarrow: pip install hive-scrutineer[export]")
+        if format not in FORMATS:
+            raise ValueError(f"format must be one of {', '.join(FORMATS)}.")
+        self._path = path
+        self._format = format
+        self._chunk_size = max(1, int(chunk_size))
+        self._columns = {}
+        self._rows = 0
+        self._schema = None
+        self._writer = None
+        self.written = 0
+
+    def write(self, analysis):
+        # skipped and empty analyses have nothing to export
+        if not analysis:
+            return
+        for name, value in _flatten(analysis).items():
+            column = self._columns.get(name)
+            if column is None:
+                column = self._columns[name] = [None] * self._rows
+            column.append(value)
+        self._rows += 1
+        for column in self._columns.values():
+            if len(column) < self._rows:
+                column.append(None)
+        if self._rows >= self._chunk_size:
+            self.flush()
+
+    def write_batch(self, analyses):
+        for analysis in analyses:
+            self.write(analysis)
+
+    def flush(self):
+        if not self._rows:
+            return
+        if self._schema is None:
+            self._schema = _schema(self._columns)
+            self._open()
+        unknown = [name for name in self._columns if self._schema.get_field_index(name) < 0]
+        if unknown:
+            # a file has one schema, later chunks can't add columns to it
+            raise ValueError(f"columns not in the schema: {', '.join(unknown)}.")
+        arrays = [
+            pa.array(self._columns.get(f.name, [None] * self._rows), type=f.type)
+            for f in self._schema
+        ]
+        batch = pa.RecordBatch.from_arrays(arrays, schema=self._schema)
+        if self._format == "parquet":
+            self._writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            self._writer.write_batch(batch)
+        self.written += self._rows
+        self._columns = {}
+        self._rows = 0
+
+    def close(self):
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _open(self):
+        if self._format == "parquet":
+            self._writer = pq.ParquetWriter(self._path, self._schema)
+        else:
+            self._writer = pa.ipc.new_file(self._path, self._schema)
+
+
+def _flatten(analysis, prefix=""):
+    flat = {}
+    for key, value in analysis.items():
+        name = prefix + key
+        if name in JSON_FIELDS:
+            flat[name] = jdumps(value)
+        elif isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        elif isinstance(value, list):
+            flat[name] = [v.get("emoji", "") if isinstance(v, dict) else v for v in value]
+        else:
+            flat[name] = value
+    return flat
+
+
+def _schema(columns):
+    # every known column, in a stable order, then whatever else came in first
+    types = _types()
+    fields = [pa.field(n, t) for n, t in types.items()]
+    for name, values in columns.items():
+        if name in types:
+            continue
+        inferred = pa.array(values).type
+        fields.append(pa.field(name, pa.string() if pa.types.is_null(inferred) else inferred))
+    return pa.schema(fields)
@@ -0,0 +1,473 @@
+# -*- coding: utf-8 -*-
+"""
+    scrutineer.fetch
+    ~~~~~~~~~
+
+    Batched JSON-RPC fetching of Hive Posts.
+
+    :copyright: 2022 Rodney Maniego Jr.
+    :license: MIT License
+"""
+
+import gzip
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from http.client import HTTPConnection, HTTPSConnection, HTTPException, RemoteDisconnected
+from json import dumps as jdumps
+from json import loads as jloads
+from queue import Empty, LifoQueue
+from random import Random
+from threading import Lock
+from time import monotonic, sleep
+from urllib.parse import urlsplit
+
+NODES = [
+    "https://api.hive.blog",
+    "https://api.openhive.network",
+    "https://anyx.io",
+    "https://rpc.ausbit.dev",
+    "https://api.deathwing.me",
+]
+
+
+class FetchPolicy:
+    def __init__(
+        self,
+        nodes=None,
+        hedge=True,
+        hedge_after=1.0,
+        window=100,
+        samples=20,
+        failures=3,
+        cooldown=30,
+    ):
+        self._hedge = isinstance(hedge, bool) * bool(hedge)
+        self._hedge_after = float(hedge_after)
+        self._samples = int(samples)
+        self._failures = int(failures)
+        self._cooldown = float(cooldown)
+        self._lock = Lock()
+        self._nodes = {
+            node: {
+                "latencies": deque(maxlen=int(window)),
+                "failures": 0,
+                "open_until": 0,
+                "served": 0,
+                "errors": 0,
+                "hedged": 0,
+            }
+            for node in (nodes or NODES)
+        }
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = Lock()
+
+    @property
+    def hedge(self):
+        return self._hedge and len(self._nodes) > 1
+
+    def order(self):
+        # healthy nodes fastest first, unmeasured nodes get explored
+        now = monotonic()
+        with self._lock:
+            healthy = [n for n, s in self._nodes.items() if s["open_until"] <= now]
+            if not healthy:
+                # half-open: retry the node whose breaker opened first
+                healthy = [min(self._nodes, key=lambda n: self._nodes[n]["open_until"])]
+            return sorted(healthy, key=lambda n: _percentile(self._nodes[n]["latencies"], 0.5))
+
+    def hedge_delay(self, node):
+        with self._lock:
+            latencies = self._nodes[node]["latencies"]
+            if len(latencies) < self._samples:
+                return self._hedge_after
+            return _percentile(latencies, 0.95)
+
+    def success(self, node, seconds):
+        with self._lock:
+            state = self._nodes[node]
+            state["latencies"].append(seconds)
+            state["failures"] = 0
+            state["open_until"] = 0
+
+    def served(self, node, hedged=False):
+        with self._lock:
+            self._nodes[node]["served"] += 1
+            self._nodes[node]["hedged"] += int(hedged)
+
+    def failure(self, node):
+        with self._lock:
+            state = self._nodes[node]
+            state["errors"] += 1
+            state["failures"] += 1
+            if state["failures"] >= self._failures:
+                state["open_until"] = monotonic() + self._cooldown
+
+    def stats(self):
+        now = monotonic()
+        with self._lock:
+            return {
+                node: {
+                    "p50": _percentile(s["latencies"], 0.5),
+                    "p95": _percentile(s["latencies"], 0.95),
+                    "served": s["served"],
+                    "hedged": s["hedged"],
+                    "errors": s["errors"],
+                    "open": s["open_until"] > now,
+                }
+                for node, s in self._nodes.items()
+            }
+
+
+class HTTPTransport:
+    def __init__(
+        self, nodes=None, pool_size=4, timeout=10, retries=1, policy=None, metrics=None
+    ):
+        self._policy = policy or FetchPolicy(nodes, hedge=False)
+        self._metrics = metrics
+        self._pool_size = int(pool_size)
+        self._timeout = float(timeout)
+        self._retries = int(retries)
+        self._pools = {}
+        self._executor = None
+        self.last_node = None
+
+    def __getstate__(self):
+        # connections and threads stay with the process that opened them
+        state = self.__dict__.copy()
+        state["_pools"] = {}
+        state["_executor"] = None
+        return state
+
+    @property
+    def policy(self):
+        return self._policy
+
+    def send(self, calls, retries=None):
+        payload = [
+            {"jsonrpc": "2.0", "method": c["method"], "params": c["params"], "id": i}
+            for i, c in enumerate(calls)
+        ]
+        retries = self._retries if retries is None else int(retries)
+        error = None
+        nodes = self._policy.order()
+        for attempt in range(retries + 1):
+            if not nodes:
+                break
+            if attempt and self._metrics is not None:
+                self._metrics.inc("scrutineer_fetch_retries_total")
+            hedge = self._policy.hedge and len(nodes) > 1
+            try:
+                if hedge:
+                    node, results, hedged = self._hedged(nodes[0], nodes[1], payload)
+                else:
+                    node, results, hedged = nodes[0], self._timed(nodes[0], payload), False
+            except (OSError, HTTPException, ValueError) as e:
+                error = e
+                # the next node, or the same one again when none is left
+                nodes = nodes[1 + hedge :] or nodes[:1]
+                continue
+            self._policy.served(node, hedged)
+            if hedged and self._metrics is not None:
+                self._metrics.inc("scrutineer_fetch_hedged_total", node=node)
+            self.last_node = node
+            return results
+        raise ConnectionError(f"Scrutineer: {error}")
+
+    def _hedged(self, primary, backup, payload):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._pool_size * 2)
+        first = self._executor.submit(self._timed, primary, payload)
+        wait([first], timeout=self._policy.hedge_delay(primary))
+        if first.done() and first.exception() is None:
+            return primary, first.result(), False
+
+        # primary is slower than its p95 or failed, race a duplicate on the backup
+        pending = {first: primary}
+        pending[self._executor.submit(self._timed, backup, payload)] = backup
+        error = None
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                node = pending.pop(future)
+                try:
+                    return node, future.result(), node != primary
+                except (OSError, HTTPException, ValueError) as e:
+                    error = e
+        raise error
+
+    def _timed(self, node, payload):
+        start = monotonic()
+        try:
+            results = _unpack(self._post(node, payload), len(payload), node)
+        except (OSError, HTTPException, ValueError):
+            self._policy.failure(node)
+            if self._metrics is not None:
+                self._metrics.inc("scrutineer_fetch_errors_total", node=node)
+            raise
+        self._policy.success(node, monotonic() - start)
+        return results
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        for pool in self._pools.values():
+            while True:
+                try:
+                    pool.get_nowait().close()
+                except Empty:
+                    break
+        self._pools = {}
+
+    def _post(self, node, payload):
+        connection, pooled = self._acquire(node)
+        try:
+            data = _request(connection, node, payload)
+        except (RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+            connection.close()
+            if not pooled:
+                raise
+            # the node closed an idle keep-alive socket, not a node failure
+            connection = self._connect(node)
+            try:
+                data = _request(connection, node, payload)
+            except Exception:
+                connection.close()
+                raise
+        except Exception:
+            connection.close()
+            raise
+        self._release(node, connection)
+        return jloads(data)
+
+    def _acquire(self, node):
+        pool = self._pools.setdefault(node, LifoQueue(self._pool_size))
+        try:
+            return pool.get_nowait(), True
+        except Empty:
+            return self._connect(node), False
+
+    def _connect(self, node):
+        parts = urlsplit(node)
+        if parts.scheme == "http":
+            return HTTPConnection(parts.netloc, timeout=self._timeout)
+        return HTTPSConnection(parts.netloc, timeout=self._timeout)
+
+    def _release(self, node, connection):
+        try:
+            self._pools[node].put_nowait(connection)
+        except Exception:
+            connection.close()
+
+
+class RecordingTransport:
+    def __init__(self, transport, path):
+        self._transport = transport
+        self._path = path
+        self._records = {}
+        self._lock = Lock()
+
+    @property
+    def last_node(self):
+        return getattr(self._transport, "last_node", None)
+
+    def send(self, calls, **options):
+        results = self._transport.send(calls, **options)
+        with self._lock:
+            for call, result in zip(calls, results):
+                self._records[_key(call)] = result
+        return results
+
+    def save(self):
+        with self._lock, gzip.open(self._path, "wt", encoding="utf-8") as f:
+            for key, result in self._records.items():
+                f.write(jdumps([key, result]) + "\n")
+
+    def close(self):
+        self.save()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ReplayTransport:
+    def __init__(self, path, strict=False):
+        self.last_node = path
+        self._records = {}
+        self._strict = bool(strict)
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                key, result = jloads(line)
+                self._records[key] = result
+
+    def send(self, calls, **options):
+        results = []
+        for call in calls:
+            key = _key(call)
+            if self._strict and key not in self._records:
+                raise KeyError(f"Scrutineer: no recording for {key}")
+            results.append(self._records.get(key))
+        return results
+
+
+class LatencyTransport:
+    def __init__(self, transport, latency=0.1, jitter=0, seed=0):
+        self._transport = transport
+        self._latency = float(latency)
+        self._jitter = float(jitter)
+        self._random = Random(seed)
+
+    @property
+    def last_node(self):
+        return getattr(self._transport, "last_node", None)
+
+    def send(self, calls, **options):
+        # one simulated round trip per batch
+        sleep(max(0, self._latency + self._random.uniform(-1, 1) * self._jitter))
+        return self._transport.send(calls, **options)
+
+
+class Fetcher:
+    def __init__(self, transport=None, batch_size=50):
+        self._transport = transport or HTTPTransport()
+        self._batch_size = max(1, int(batch_size))
+        self.served = {}
+
+    def batch(self, calls):
+        return self._batch(calls)[0]
+
+    def _batch(self, calls, retries=None):
+        # retries override the transport's own, when given
+        options = {} if retries is None else {"retries": retries}
+        results, nodes = [], []
+        for i in range(0, len(calls), self._batch_size):
+            chunk = self._transport.send(calls[i : i + self._batch_size], **options)
+            results.extend(chunk)
+            nodes.extend([getattr(self._transport, "last_node", None)] * len(chunk))
+        return results, nodes
+
+    def call(self, method, params):
+        return self.batch([{"method": method, "params": params}])[0]
+
+    def get_posts(self, keys, retries=None):
+        calls = [
+            {"method": "bridge.get_post", "params": {"author": a, "permlink": p}}
+            for a, p in keys
+        ]
+        posts, nodes = self._batch(calls, retries)
+        self.served = dict(zip(keys, nodes))
+        return [post or {} for post in posts]
+
+    def get_blogs(self, authors, limit=2):
+        authors = list(dict.fromkeys(authors))
+        calls = [
+            {
+                "method": "bridge.get_account_posts",
+                "params": {"account": a, "sort": "posts", "limit": limit, "observer": ""},
+            }
+            for a in authors
+        ]
+        blogs = {}
+        for author, posts in zip(authors, self.batch(calls)):
+            blogs[author] = [p for p in (posts or []) if not p.get("depth")]
+        return blogs
+
+    def get_discussion(self, author, permlink):
+        # the post and every reply below it, keyed by "author/permlink"
+        params = {"author": author, "permlink": permlink, "observer": ""}
+        return self.call("bridge.get_discussion", params) or {}
+
+    def get_blocks(self, start, count):
+        # block_api caps a range at 1000 blocks
+        blocks = []
+        calls = [
+            {
+                "method": "block_api.get_block_range",
+                "params": {"starting_block_num": n, "count": min(1000, start + count - n)},
+            }
+            for n in range(start, start + count, 1000)
+        ]
+        for result in self.batch(calls):
+            if not result:
+                raise ConnectionError("Scrutineer: missing block range.")
+            blocks.extend(result.get("blocks", []))
+        return blocks
+
+    def get_block_time(self, number):
+        header = self.call("block_api.get_block_header", {"block_num": number})
+        return header["header"]["timestamp"]
+
+    def get_head_block(self):
+        properties = self.call("condenser_api.get_dynamic_global_properties", [])
+        return properties["head_block_number"]
+
+    # same signatures as nektar.Waggle, so either can back Scrutineer
+    def get_post(self, author, permlink, retries=None):
+        return self.get_posts([(author, permlink)], retries)[0]
+
+    def blogs(self, account=None, limit=20):
+        return self.get_blogs([account], limit=limit)[account]
+
+
+def _request(connection, node, payload):
+    connection.request(
+        "POST",
+        urlsplit(node).path or "/",
+        body=jdumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    response = connection.getresponse()
+    data = response.read()
+    if response.status != 200:
+        raise HTTPException(f"{node} returned HTTP {response.status}")
+    return data
+
+
+def _percentile(values, q):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def _key(call):
+    return jdumps([call["method"], call["params"]], sort_keys=True)
+
+
+def _unpack(response, length, node=None):
+    # a node that errors on the whole batch failed, a missing post is just a miss
+    if isinstance(response, dict):
+        if "error" in response and not isinstance(response.get("id"), int):
+            raise HTTPException(f"{node} returned {response['error']}")
+        response = [response]
+    results = [None] * length
+    errors = []
+    for item in response:
+        if "error" in item:
+            errors.append(item["error"])
+            continue
+        index = item.get("id")
+        if isinstance(index, int) and 0 <= index < length:
+            results[index] = item.get("result")
+    if errors and len(errors) == len(response) and not all(map(_missing, errors)):
+        raise HTTPException(f"{node} returned {errors[0]}")
+    return results
+
+
+def _missing(error):
+    if not isinstance(error, dict):
+        return False
+    if error.get("code") == -32602:
+        return True
+    text = f"{error.get('message', '')} {error.get('data', '')}".lower()
+    return "not found" in text or "does not exist" in text
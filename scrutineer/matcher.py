@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+    scrutineer.matcher
+    ~~~~~~~~~
+
+    Aho-Corasick matching of many keywords in a single pass.
+
+    :copyright: 2022 Rodney Maniego Jr.
+    :license: MIT License
+"""
+
+from collections import deque
+
+
+class KeywordMatcher:
+    def __init__(self, keywords, words=True):
+        self._words = isinstance(words, bool) * bool(words)
+        self._keywords = list(dict.fromkeys(k.lower() for k in keywords if k))
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for index, keyword in enumerate(self._keywords):
+            self._add(keyword, index)
+        self._link()
+
+    def __len__(self):
+        return len(self._keywords)
+
+    def finditer(self, text):
+        # yields (start, end, keyword) for every hit, overlapping ones included
+        text = text.lower()
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                keyword = self._keywords[index]
+                start = i - len(keyword) + 1
+                if self._words and not _bounded(text, start, i + 1):
+                    continue
+                yield start, i + 1, keyword
+
+    def search(self, text):
+        for hit in self.finditer(text):
+            return hit
+        return None
+
+    def findall(self, text):
+        return list(dict.fromkeys(keyword for _, _, keyword in self.finditer(text)))
+
+    def _add(self, keyword, index):
+        state = 0
+        for char in keyword:
+            following = self._goto[state].get(char)
+            if following is None:
+                following = len(self._goto)
+                self._goto[state][char] = following
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = following
+        self._output[state].append(index)
+
+    def _link(self):
+        # breadth-first failure links, outputs inherited along them
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self._goto[state].items():
+                queue.append(following)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[following] = self._goto[fallback].get(char, 0)
+                self._output[following] = (
+                    self._output[following] + self._output[self._fail[following]]
+                )
+
+
+def _bounded(text, start, end):
+    before = start > 0 and _is_word(text[start - 1])
+    after = end < len(text) and _is_word(text[end])
+    return not (before or after)
+
+
+def _is_word(char):
+    return char.isalnum() or char == "_"
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+    scrutineer.metrics
+    ~~~~~~~~~
+
+    Counters and histograms, in Prometheus text format or through a callback.
+
+    :copyright: 2022 Rodney Maniego Jr.
+    :license: MIT License
+"""
+
+from bisect import bisect_left
+from threading import Lock
+from time import monotonic
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Metrics:
+    def __init__(self, callback=None, buckets=BUCKETS):
+        self._callback = callback
+        self._buckets = tuple(sorted(buckets))
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+        self._started = monotonic()
+        self._lock = Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        if self._callback is not None:
+            self._callback(name, value, labels)
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {
+                    "buckets": [0] * (len(self._buckets) + 1),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            histogram["buckets"][bisect_left(self._buckets, value)] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+        if self._callback is not None:
+            self._callback(name, value, labels)
+
+    def add_collector(self, collector):
+        # collector() returns {gauge name: value}, read on every snapshot
+        self._collectors.append(collector)
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {k: _copy(h) for k, h in self._histograms.items()}
+        gauges = {}
+        for collector in self._collectors:
+            gauges.update(collector())
+
+        posts = [v for (n, _), v in counters.items() if n == "scrutineer_posts_total"]
+        if posts:
+            elapsed = max(1e-9, monotonic() - self._started)
+            gauges["scrutineer_posts_per_second"] = sum(posts) / elapsed
+        return {"counters": counters, "histograms": histograms, "gauges": gauges}
+
+    def render(self):
+        snapshot = self.snapshot()
+        lines = []
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(snapshot["counters"].items()):
+            declare(name, "counter")
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), histogram in sorted(snapshot["histograms"].items()):
+            declare(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(self._buckets + ("+Inf",), histogram["buckets"]):
+                cumulative += count
+                le = labels + (("le", str(bound)),)
+                lines.append(f"{name}_bucket{_labels(le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {histogram['sum']}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram['count']}")
+        for name, value in sorted(snapshot["gauges"].items()):
+            declare(name, "gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _copy(histogram):
+    return {
+        "buckets": list(histogram["buckets"]),
+        "sum": histogram["sum"],
+        "count": histogram["count"],
+    }
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+    scrutineer.prefilter
+    ~~~~~~~~~
+
+    Author allow and deny lists, checked before any fetch or parsing.
+
+    :copyright: 2022 Rodney Maniego Jr.
+    :license: MIT License
+"""
+
+import os
+from hashlib import blake2b
+from math import ceil, log
+from threading import Lock, Thread
+from time import monotonic
+
+DECISIONS = ("allow", "deny")
+
+
+class BloomFilter:
+    def __init__(self, capacity, error=0.001):
+        capacity = max(1, int(capacity))
+        if not (0 < float(error) < 1):
+            raise ValueError("error must be between 0 and 1.")
+        self._size = max(8, ceil(-capacity * log(error) / (log(2) ** 2)))
+        # one blake2b digest holds at most 16 positions
+        self._hashes = min(16, max(1, round(self._size / capacity * log(2))))
+        self._bits = bytearray((self._size + 7) // 8)
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, key):
+        bits = self._bits
+        return all(bits[i >> 3] & (1 << (i & 7)) for i in self._indexes(key))
+
+    def add(self, key):
+        for i in self._indexes(key):
+            self._bits[i >> 3] |= 1 << (i & 7)
+        self._count += 1
+
+    def update(self, keys):
+        for key in keys:
+            self.add(key)
+
+    def _indexes(self, key):
+        # k 32-bit positions cut from one digest
+        digest = blake2b(key.encode("utf-8"), digest_size=4 * self._hashes).digest()
+        size = self._size
+        return [h % size for h in memoryview(digest).cast("I")]
+
+
+class Prefilter:
+    def __init__(self, allow=None, deny=None, exact_limit=100000, error=0.001, watch=None):
+        # lists are iterables of account names, or paths to files of one name per line
+        self._exact_limit = int(exact_limit)
+        self._error = float(error)
+        self._watch = float(watch) if watch else None
+        self._sources = {"allow": allow, "deny": deny}
+        self._lists = {"allow": frozenset(), "deny": frozenset()}
+        self._stamps = {}
+        self._checked = monotonic()
+        self._lock = Lock()
+        self._thread = None
+        self.reload()
+
+    def check(self, author):
+        # "deny", "allow" or None; an author on both lists is denied
+        if self._watch is not None and monotonic() - self._checked > self._watch:
+            self._watch_files()
+        lists = self._lists
+        author = _normalize(author)
+        for decision in ("deny", "allow"):
+            if author in lists[decision]:
+                return decision
+        return None
+
+    def reload(self, **sources):
+        # new lists, or the same files read again, swapped in all at once
+        for decision in sources:
+            if decision not in DECISIONS:
+                raise ValueError(f"list must be one of {', '.join(DECISIONS)}.")
+        with self._lock:
+            self._sources.update(sources)
+            self._stamps = {d: _stamp(s) for d, s in self._sources.items()}
+            self._lists = {d: self._build(s) for d, s in self._sources.items()}
+            self._checked = monotonic()
+
+    def stats(self):
+        return {
+            decision: {"size": len(names), "bloom": isinstance(names, BloomFilter)}
+            for decision, names in self._lists.items()
+        }
+
+    def _watch_files(self):
+        # files are re-read off the checking thread, one refresh at a time
+        self._checked = monotonic()
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = Thread(target=self._refresh, daemon=True)
+            self._thread.start()
+
+    def _refresh(self):
+        sources = dict(self._sources)
+        stamps = {d: _stamp(s) for d, s in sources.items()}
+        if stamps == self._stamps:
+            return
+        try:
+            lists = {d: self._build(s) for d, s in sources.items()}
+        except OSError:
+            # a file mid-rotation, keep the current lists and try again later
+            return
+        with self._lock:
+            # a reload() since the build wins
+            if all(self._sources[d] is s for d, s in sources.items()):
+                self._stamps = stamps
+                self._lists = lists
+
+    def _build(self, source):
+        if source is None:
+            return frozenset()
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, "r", encoding="utf-8") as f:
+                names = [_normalize(line) for line in f if not line.startswith("#")]
+        else:
+            names = [_normalize(name) for name in source]
+        names = [name for name in names if name]
+        if len(names) <= self._exact_limit:
+            return frozenset(names)
+        # too many names to hold exactly, accept a few false positives
+        bloom = BloomFilter(len(names), self._error)
+        bloom.update(names)
+        return bloom
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_thread"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = Lock()
+
+
+def _normalize(name):
+    return name.strip().lstrip("@").lower()
+
+
+def _stamp(source):
+    # file lists are re-read when their modification time changes
+    if isinstance(source, (str, os.PathLike)) and os.path.exists(source):
+        return os.stat(source).st_mtime_ns
+    return None
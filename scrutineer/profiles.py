@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+    scrutineer.profiles
+    ~~~~~~~~~
+
+    Named scoring profiles, resolved per post from its community or tags.
+
+    :copyright: 2022 Rodney Maniego Jr.
+    :license: MIT License
+"""
+
+from json import loads as jloads
+
+WEIGHTS = ("title", "body", "emojis", "images", "tagging", "tags")
+
+
+class Profile:
+    def __init__(
+        self,
+        name,
+        communities=None,
+        tags=None,
+        weights=None,
+        minimum_score=80,
+        max_emojis=0,
+        max_user_tags=5,
+        max_tags=5,
+    ):
+        weights = weights or {}
+        for key in weights:
+            if key not in WEIGHTS:
+                raise ValueError(f"weights must be one of {', '.join(WEIGHTS)}.")
+        self.name = str(name)
+        self.communities = frozenset(c.lower() for c in (communities or []))
+        self.tags = frozenset(t.lower() for t in (tags or []))
+        self.minimum_score = float(minimum_score)
+        self.max_emojis = int(max_emojis)
+        self.max_user_tags = int(max_user_tags)
+        self.max_tags = int(max_tags)
+        # normalized once, a score is then a plain dot product
+        raw = [float(weights.get(key, 1)) for key in WEIGHTS]
+        total = sum(raw) or 1
+        self.weights = tuple(w / total for w in raw)
+
+    def __repr__(self):
+        return f"Profile({self.name!r})"
+
+
+class Profiles:
+    def __init__(self, profiles, default=None):
+        self._profiles = list(profiles)
+        self._default = default
+        names = [p.name for p in self._profiles]
+        if len(set(names)) != len(names):
+            raise ValueError("profile names must be unique.")
+        if default is not None and default not in names:
+            raise ValueError(f"default must be one of {', '.join(names)}.")
+        # community and tag lookups instead of a scan over every profile
+        self._communities, self._tags = {}, {}
+        for order, profile in enumerate(self._profiles):
+            for community in profile.communities:
+                self._communities.setdefault(community, []).append(order)
+            for tag in profile.tags:
+                self._tags.setdefault(tag, []).append(order)
+
+    def __len__(self):
+        return len(self._profiles)
+
+    def __iter__(self):
+        return iter(self._profiles)
+
+    def get(self, name):
+        for profile in self._profiles:
+            if profile.name == name:
+                return profile
+        return None
+
+    def resolve(self, post, tags=None):
+        # every matching profile, in the order given, or the default one
+        if tags is None:
+            tags = _tags(post)
+        matches = set()
+        for community in (post.get("community"), post.get("category")):
+            if community:
+                matches.update(self._communities.get(community.lower(), []))
+        for tag in tags:
+            matches.update(self._tags.get(str(tag).lower(), []))
+        if not matches and self._default is not None:
+            return [self.get(self._default)]
+        return [self._profiles[order] for order in sorted(matches)]
+
+
+def _tags(post):
+    metadata = post.get("json_metadata") or {}
+    if isinstance(metadata, str):
+        metadata = jloads(metadata)
+    return metadata.get("tags", [])
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+    scrutineer.ranking
+    ~~~~~~~~~
+
+    Bounded top-N leaderboards over streams of Scrutineer analyses.
+
+    :copyright: 2022 Rodney Maniego Jr.
+    :license: MIT License
+"""
+
+from datetime import datetime, timezone
+from heapq import heapify, heappush, heapreplace
+from itertools import count
+from time import time
+
+
+class Leaderboard:
+    def __init__(self, size=10, field="score", window=None, key=None):
+        self._size = max(1, int(size))
+        self._field = field
+        self._window = float(window) if window else None
+        self._key = key or _post_key
+        self._heaps = {}
+        self._sequence = count()
+        self.rejected = 0
+
+    def keys(self):
+        return list(self._heaps)
+
+    def offer(self, key, analysis, timestamp=None):
+        # keeps the analysis if it beats the current Nth place
+        if not analysis or "score" not in analysis:
+            return False
+        timestamp = time() if timestamp is None else float(timestamp)
+        heap = self._evict(key, timestamp)
+        entry = (_value(analysis, self._field), timestamp, next(self._sequence), analysis)
+        if len(heap) < self._size:
+            heappush(heap, entry)
+            return True
+        if entry[0] <= heap[0][0]:
+            return False
+        heapreplace(heap, entry)
+        return True
+
+    def threshold(self, key, now=None):
+        heap = self._evict(key, time() if now is None else float(now))
+        if len(heap) < self._size:
+            return None
+        return heap[0][0]
+
+    def top(self, key, now=None):
+        heap = self._evict(key, time() if now is None else float(now))
+        return [entry[3] for entry in sorted(heap, key=lambda e: (-e[0], e[2]))]
+
+    def analyze(self, analyzer, post, key=None, timestamp=None, auto_skip=False):
+        # posts that can't beat the Nth place stop before language detection
+        if key is None:
+            key = self._key(post)
+        if timestamp is None:
+            timestamp = _created(post)
+        floor = None
+        if self._field == "score":
+            floor = self.threshold(key, timestamp)
+        analysis = analyzer.analyze(post, auto_skip=auto_skip, floor=floor)
+        if not analysis:
+            if analyzer.outcome == "floor":
+                self.rejected += 1
+            return analysis
+        self.offer(key, analysis, timestamp)
+        return analysis
+
+    def _evict(self, key, now):
+        heap = self._heaps.setdefault(key, [])
+        if self._window is not None:
+            cutoff = now - self._window
+            if any(entry[1] < cutoff for entry in heap):
+                heap[:] = [entry for entry in heap if entry[1] >= cutoff]
+                heapify(heap)
+        return heap
+
+
+def _value(analysis, field):
+    value = analysis.get(field, 0)
+    if isinstance(value, dict):
+        value = value.get("score", 0)
+    return float(value)
+
+
+def _post_key(post):
+    if not isinstance(post, dict):
+        return None
+    if post.get("community"):
+        return post["community"]
+    if post.get("category"):
+        return post["category"]
+    return None
+
+
+def _created(post):
+    created = post.get("created") if isinstance(post, dict) else None
+    if not created:
+        return time()
+    stamp = datetime.fromisoformat(created)
+    if stamp.tzinfo is None:
+        stamp = stamp.replace(tzinfo=timezone.utc)
+    return stamp.timestamp()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+    scrutineer.schedule
+    ~~~~~~~~~
+
+    Size-aware scheduling of parallel batch analysis.
+
+    :copyright: 2022 Rodney Maniego Jr.
+    :license: MIT License
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import blake2b
+from multiprocessing import get_context
+
+from .scrutineer import Scrutineer, preload
+
+# fixed cost of any post, in bytes of body
+BASE_COST = 2000
+# a deep analysis also fetches and compares the author's previous post
+DEEP_COST = 20000
+
+# chunks per worker, when no chunk_cost is given
+CHUNKS = 16
+
+_analyzer = None
+
+
+def _init_worker(options, weights):
+    global _analyzer
+    _analyzer = Scrutineer(**options)
+    _analyzer.set_weights(**weights)
+
+
+def _analyze_chunk(chunk, auto_skip):
+    indexes, posts = zip(*chunk)
+    return list(zip(indexes, _analyzer.analyze_batch(posts, auto_skip=auto_skip)))
+
+
+class Scheduler:
+    def __init__(self, workers=4, chunk_cost=None, preloaded=False, weights=None, **options):
+        self._workers = max(1, int(workers))
+        self._chunk_cost = int(chunk_cost) if chunk_cost else None
+        self._deep = isinstance(options.get("deep"), bool) * bool(options.get("deep"))
+        self._analyzer = Scrutineer(**options)
+        self._analyzer.set_weights(**(weights or {}))
+        self._executor = None
+        if self._workers > 1:
+            context = None
+            if preloaded:
+                preload()
+                context = get_context("fork")
+            self._executor = ProcessPoolExecutor(
+                self._workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(options, weights or {}),
+            )
+
+    def estimate(self, post):
+        if not post:
+            return 0
+        return BASE_COST + len(post.get("body") or "") + DEEP_COST * self._deep
+
+    def map(self, posts, auto_skip=False):
+        # analyses in input order, whatever order they finished in
+        posts = self._analyzer.fetch_batch(posts)
+        if self._executor is None:
+            return self._analyzer.analyze_batch(posts, auto_skip=auto_skip)
+
+        results = [{}] * len(posts)
+        # copies of a body travel together, and cost as one
+        groups = {}
+        for index, post in enumerate(posts):
+            if post:
+                body = (post.get("body") or "").encode("utf-8")
+                key = blake2b(body, digest_size=16).digest()
+                groups.setdefault(key, []).append((index, post))
+        tasks = sorted(
+            ((self.estimate(g[0][1]), g) for g in groups.values()),
+            key=lambda t: -t[0],
+        )
+        if not tasks:
+            return results
+        target = self._chunk_cost or max(1, sum(t[0] for t in tasks) // (self._workers * CHUNKS))
+        # the pool hands out chunks in submission order, so idle workers take the longest left
+        futures = [
+            self._executor.submit(_analyze_chunk, chunk, auto_skip)
+            for chunk in _chunks(tasks, target)
+        ]
+        try:
+            for future in futures:
+                for index, analysis in future.result():
+                    results[index] = analysis
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+        return results
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _chunks(tasks, target):
+    # big posts go alone, small ones are grouped up to the target cost
+    chunk, cost = [], 0
+    for task in tasks:
+        chunk.extend(task[1])
+        cost += task[0]
+        if cost >= target:
+            yield chunk
+            chunk, cost = [], 0
+    if chunk:
+        yield chunk
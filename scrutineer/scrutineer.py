@@ -9,12 +9,27 @@
     :license: MIT License
 """
 
+import gc
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from copy import deepcopy
+from hashlib import blake2b
 from json import loads as jloads
+from math import sqrt
+from random import Random
 from re import compile as rcompile
+from threading import Lock, Thread
+from time import monotonic
 
 from nektar import Waggle
+from .fetch import Fetcher, HTTPTransport
+from .matcher import KeywordMatcher
+from .prefilter import Prefilter
+from .profiles import Profiles
 from emoji import emoji_list
 from langdetect import detect_langs
+from langdetect import detector_factory
 
 RE_DASH = rcompile(r"(\-|\u2013|\u2014)")
 RE_N_RANK = rcompile(r"\#[\d]+")
@@ -24,6 +39,7 @@ RE_MULTI_SPACE = rcompile(r"\s{2,}")
 RE_UPPERCASE = rcompile(r"[A-Z]")
 RE_CLEAN_TITLE = rcompile(r"[^\w\'\,\-\ ]+")
 RE_DELIMITERS = rcompile(r"[\n\.]")
+RE_PARAGRAPHS = rcompile(r"\n\s*\n")
 RE_IMAGE = rcompile(r"!\[[^\]]*\]\([^\)]+\)")
 RE_IMAGES = rcompile(r"!\[[^\]]*\]\([^\)]+\)\s*!\[[^\]]*\]\([^\)]+\)")
 RE_HIVE_SVC = rcompile(r"\[\/\/\]:#[\ ]+\([!][\w\ \.]+\)")
@@ -45,6 +61,19 @@ RE_NUMBERS = rcompile(r"\d+\.?\d*")
 RE_PUNCTUATIONS = rcompile(r"[\.\,\!\?]")
 RE_NON_ASCII = rcompile(r"[^ -~]")
 RE_WORD = rcompile(r"\w[^\s]+")
+RE_SAFE_END = rcompile(r"(?:^|[\ \t])[\w']+[\.\,\!\?]*[\ \t]*\n$")
+RE_SAFE_START = rcompile(r"[\ \t]*[\w']+(?:[\s\.\,\!\?]|$)")
+RE_EMOJI_RUNS = rcompile(r"[^\x00-\x7f]+|[#*0-9]\ufe0f?\u20e3")
+
+DEGRADE_POLICIES = ("truncate", "sample", "skip")
+
+# replies shorter than this are not worth a language detection
+COMMENT_MIN_WORDS = 3
+# english words for a reply to earn a full body score
+COMMENT_WORDS = 40
+
+# language detections made within the current analysis, one counter per context
+_detections = ContextVar("detections", default=None)
 
 STOP_WORDS = [
     "0s",
@@ -846,6 +875,17 @@ class Scrutineer:
         retries=1,
         deep=False,
         full=False,
+        sample=False,
+        cache=None,
+        fetcher=None,
+        policy=None,
+        max_bytes=None,
+        max_seconds=None,
+        degrade="truncate",
+        metrics=None,
+        keywords=None,
+        prefilter=None,
+        profiles=None,
     ):
         self._weights = [1, 1, 1, 1, 1, 1]
         self._minimum_score = float(minimum_score)
@@ -855,11 +895,37 @@ class Scrutineer:
         self._retries = int(retries)
         self._deep = isinstance(deep, bool) * bool(deep)
         self._full = isinstance(full, bool) * bool(full)
+        self._sample = isinstance(sample, bool) * bool(sample)
+        self._cache = cache if isinstance(cache, LanguageCache) else None
+        self._max_bytes = int(max_bytes) if max_bytes else None
+        self._max_seconds = float(max_seconds) if max_seconds else None
+        if degrade not in DEGRADE_POLICIES:
+            raise ValueError(f"degrade must be one of {', '.join(DEGRADE_POLICIES)}.")
+        self._degrade = degrade
+        self._metrics = metrics
+        self._keywords = None
+        if keywords is not None:
+            self._keywords = (
+                keywords if isinstance(keywords, KeywordMatcher) else KeywordMatcher(keywords)
+            )
+        self._prefilter = prefilter if isinstance(prefilter, Prefilter) else None
+        self._profiles = None
+        if profiles is not None:
+            self._profiles = profiles if isinstance(profiles, Profiles) else Profiles(profiles)
+        self._outcome = None
+        if metrics is not None and self._cache is not None:
+            metrics.add_collector(self._cache_gauges)
         self._permlink = None
         self._previous = None
         self._template = []
         self._analysis = {}
-        self._waggle = Waggle("")
+        self._blogs = {}
+        self._bodies = None
+        self._window = None
+        if fetcher is None and policy is not None:
+            transport = HTTPTransport(retries=retries, policy=policy, metrics=metrics)
+            fetcher = Fetcher(transport)
+        self._waggle = fetcher if fetcher is not None else Waggle("")
 
     def set_weights(self, title=1, body=1, emojis=1, images=1, tagging=1, tags=1):
         self._weights = [
@@ -871,16 +937,264 @@ class Scrutineer:
             float(tags),
         ]
 
-    def analyze(self, post, permlink=None, auto_skip=False):
+    def fetch_batch(self, posts):
+        # posts are dicts or (author, permlink) pairs, missing ones come back empty
+        posts = list(posts)
+        # listed authors are not fetched, their analysis stops at the prefilter
+        posts = [
+            {"author": p[0], "permlink": p[1]}
+            if not isinstance(p, dict) and self._held(p[0])
+            else p
+            for p in posts
+        ]
+        keys = [p for p in posts if not isinstance(p, dict)]
+        if not keys:
+            return posts
+        if hasattr(self._waggle, "get_posts"):
+            fetched = iter(self._waggle.get_posts(keys, retries=self._retries))
+        else:
+            fetched = iter(self._waggle.get_post(a, p, retries=self._retries) for a, p in keys)
+        return [p if isinstance(p, dict) else next(fetched) for p in posts]
+
+    def analyze_batch(self, posts, auto_skip=False, dedup=True):
+        posts = self.fetch_batch(posts)
+        if self._deep and hasattr(self._waggle, "get_blogs"):
+            authors = [p["author"] for p in posts if p and not self._held(p["author"])]
+            self._blogs = self._waggle.get_blogs(authors)
+        # a batch run from within a stream leaves the stream's copies alone
+        bodies, window = self._bodies, self._window
+        self._bodies, self._window = OrderedDict() if dedup else None, None
+        try:
+            return [self.analyze(p, auto_skip=auto_skip) if p else {} for p in posts]
+        finally:
+            self._blogs = {}
+            self._bodies, self._window = bodies, window
+
+    def analyze_stream(self, posts, auto_skip=False, window=1024):
+        # copies among the last `window` distinct bodies are analyzed once
+        bodies, previous = self._bodies, self._window
+        self._bodies, self._window = OrderedDict(), max(1, int(window))
+        try:
+            for post in posts:
+                if not post:
+                    yield {}
+                elif isinstance(post, dict):
+                    yield self.analyze(post, auto_skip=auto_skip)
+                else:
+                    yield self.analyze(*post, auto_skip=auto_skip)
+        finally:
+            self._bodies, self._window = bodies, previous
+
+    def analyze_thread(self, post, permlink=None):
+        # the post itself in full, its replies through a lighter comment pipeline
+        if isinstance(post, dict):
+            post, permlink = post["author"], post["permlink"]
+        if self._held(post):
+            # replies to a listed author are not fetched either
+            return {
+                "author": post,
+                "permlink": permlink,
+                "post": self.analyze(post, permlink),
+                "comments": [],
+                "thread": {"comments": 0, "authors": 0, "depth": 0, "score": 0},
+            }
+        started = monotonic()
+        discussion = self._get_discussion(post, permlink)
+        self._stage("fetch", started)
+        root = discussion.get(f"{post}/{permlink}")
+        if not root:
+            self._outcome = "missing"
+            return {}
+
+        # a thread analyzed from within a batch or stream leaves its copies alone
+        bodies, window = self._bodies, self._window
+        self._bodies, self._window = OrderedDict(), None
+        try:
+            with self._counting():
+                if root.get("depth"):
+                    analysis = self._analyze_comment(root)
+                else:
+                    analysis = self.analyze(root)
+                comments = []
+                stack = list(reversed(root.get("replies", [])))
+                while stack:
+                    comment = discussion.get(stack.pop())
+                    if not comment:
+                        continue
+                    comments.append(self._analyze_comment(comment))
+                    stack.extend(reversed(comment.get("replies", [])))
+        finally:
+            self._bodies, self._window = bodies, window
+        if self._metrics is not None:
+            self._metrics.inc("scrutineer_comments_total", len(comments))
+
+        scores = [c["score"] for c in comments if "score" in c]
+        return {
+            "author": post,
+            "permlink": permlink,
+            "post": analysis,
+            "comments": comments,
+            "thread": {
+                "comments": len(comments),
+                "authors": len({c["author"] for c in comments}),
+                "depth": max((c["depth"] - root.get("depth", 0) for c in comments), default=0),
+                "score": sum(scores) / len(scores) if scores else 0,
+            },
+        }
+
+    def _get_discussion(self, author, permlink):
+        if hasattr(self._waggle, "get_discussion"):
+            return self._waggle.get_discussion(author, permlink)
+        # without a bulk endpoint, one call per post that has replies
+        root = self._waggle.get_post(author, permlink, retries=self._retries)
+        if not root:
+            return {}
+        discussion = {f"{author}/{permlink}": dict(root, replies=[])}
+        queue = deque([(author, permlink)])
+        while queue:
+            parent = "/".join(queue.popleft())
+            if not discussion[parent].get("children", 1):
+                continue
+            for reply in self._waggle.replies(*parent.split("/", 1)) or []:
+                key = f"{reply['author']}/{reply['permlink']}"
+                discussion[key] = dict(reply, replies=[])
+                discussion[parent]["replies"].append(key)
+                queue.append((reply["author"], reply["permlink"]))
+        return discussion
+
+    def _analyze_comment(self, comment):
+        # no title or tags to check, and no template to strip
+        analysis = {
+            "author": comment["author"],
+            "permlink": comment["permlink"],
+            "parent": f"{comment.get('parent_author')}/{comment.get('parent_permlink')}",
+            "depth": comment.get("depth", 0),
+        }
+        if self._prefilter is not None:
+            decision = self._prefilter.check(comment["author"])
+            if decision is not None:
+                analysis["prefilter"] = decision
+                return analysis
+
+        body = comment.get("body") or ""
+        shared = self._shared(body)
+        if "comment" not in shared:
+            scan = _scan_body(body)
+            cleaned = _parse_body(body, scan)
+            weights = (self._weights[1], self._weights[2], self._weights[4])
+            scores = (
+                _analyze_comment_body(cleaned, self._full, cache=self._cache),
+                _analyze_emojis(body, self._max_emojis, self._full, scan=scan),
+                _analyze_overtagging(body, self._max_user_tags, self._full, scan=scan),
+            )
+            score = sum(_subscore(s) * w for s, w in zip(scores, weights))
+            shared["comment"] = dict(
+                zip(("body", "emojis", "tagging"), scores),
+                score=score / (sum(weights) or 1),
+            )
+        analysis.update(_copied(shared["comment"]))
+        return analysis
+
+    def _held(self, author):
+        return self._prefilter is not None and self._prefilter.check(author) is not None
+
+    def _get_blogs(self, author):
+        if author in self._blogs:
+            return self._blogs[author]
+        return self._waggle.blogs(author, limit=2)
+
+    @property
+    def outcome(self):
+        # how the last analysis ended: scored, missing, empty, auto_skip, floor, budget
+        # or prefilter
+        return self._outcome
+
+    def analyze(self, post, permlink=None, auto_skip=False, floor=None):
+        if self._metrics is None:
+            return self._analyze(post, permlink, auto_skip, floor)
+
+        started = monotonic()
+        with self._counting():
+            analysis = self._analyze(post, permlink, auto_skip, floor)
+        self._stage("total", started)
+        self._metrics.inc("scrutineer_posts_total", result=self._outcome)
+        return analysis
+
+    @contextmanager
+    def _counting(self):
+        # an analysis nested within counts its own detections
+        if self._metrics is None:
+            yield
+            return
+        counter = [0]
+        token = _detections.set(counter)
+        try:
+            yield
+        finally:
+            _detections.reset(token)
+            self._metrics.inc("scrutineer_language_detections_total", counter[0])
+
+    def _stage(self, stage, started):
+        if self._metrics is not None:
+            self._metrics.observe("scrutineer_stage_seconds", monotonic() - started, stage=stage)
+
+    def _shared(self, body):
+        # body-derived results, shared by every copy of the same body
+        if self._bodies is None:
+            return {}
+        key = blake2b(body.encode("utf-8"), digest_size=16).digest()
+        shared = self._bodies.get(key)
+        if shared is not None:
+            self._bodies.move_to_end(key)
+        else:
+            shared = self._bodies[key] = {}
+            if self._window is not None and len(self._bodies) > self._window:
+                self._bodies.popitem(last=False)
+        if self._metrics is not None:
+            result = "miss" if not shared else "hit"
+            self._metrics.inc("scrutineer_dedup_total", result=result)
+        return shared
+
+    def _cache_gauges(self):
+        stats = self._cache.stats()
+        return {
+            "scrutineer_language_cache_size": stats["size"],
+            "scrutineer_language_cache_hits": stats["hits"],
+            "scrutineer_language_cache_misses": stats["misses"],
+            "scrutineer_language_cache_hit_rate": stats["hit_rate"],
+        }
+
+    def _ceiling(self, title, emojis, tags):
+        # best possible score, if body, images and tagging all came out perfect
+        scores = [_subscore(title), 1, _subscore(emojis), 1, 1, _subscore(tags)]
+        return sum(s * w for s, w in zip(scores, self._weights)) / sum(self._weights)
+
+    def _analyze(self, post, permlink=None, auto_skip=False, floor=None):
         self._analysis = {}
+        self._outcome = "empty"
         
         if isinstance(post, dict):
             author = post["author"]
             permlink = post["permlink"]
-        if not isinstance(post, dict):
+        else:
             author = post
+
+        if self._prefilter is not None:
+            decision = self._prefilter.check(author)
+            if decision is not None:
+                self._outcome = "prefilter"
+                self._analysis["author"] = author
+                self._analysis["permlink"] = permlink
+                self._analysis["prefilter"] = decision
+                self._analysis["skipped"] = True
+                return self._analysis
+
+        if not isinstance(post, dict):
+            started = monotonic()
             post = self._waggle.get_post(author, permlink, retries=self._retries)
+            self._stage("fetch", started)
             if not post:
+                self._outcome = "missing"
                 return {}
 
         self._analysis["author"] = author
@@ -888,6 +1202,9 @@ class Scrutineer:
 
         if self._full:
             self._analysis["url"] = post["url"]
+            served = getattr(self._waggle, "served", {})
+            if (author, permlink) in served:
+                self._analysis["node"] = served[(author, permlink)]
 
         title = post["title"]
         if not len(title):
@@ -896,9 +1213,11 @@ class Scrutineer:
         body = post["body"]
         if self._deep:
             raw_body = body.split("\n")
+            template = "hit"
             if author != self._previous or (permlink == self._permlink and author == self._previous):
+                template = "miss"
                 self._previous = author
-                for blog in self._waggle.blogs(author, limit=2):
+                for blog in self._get_blogs(author):
                     if blog["permlink"] == self._permlink:
                         continue
                     self._permlink = blog["permlink"]
@@ -906,38 +1225,118 @@ class Scrutineer:
                     break
             body = "\n".join([l for l in raw_body
                 if l not in self._template])
-        cleaned = _parse_body(body)
+            if self._metrics is not None:
+                self._metrics.inc("scrutineer_deep_templates_total", result=template)
+
+        degraded = []
+        budgeted = self._max_bytes is not None or self._max_seconds is not None
+        if self._max_bytes is not None and len(body.encode("utf-8")) > self._max_bytes:
+            if self._degrade == "skip":
+                return self._skipped("bytes")
+            if self._degrade == "sample":
+                body = _sample_body(body, self._max_bytes)
+            else:
+                body = _truncate_body(body, self._max_bytes)
+            degraded.append("bytes")
+
+        shared = self._shared(body)
+        started = monotonic()
+        if "cleaned" not in shared:
+            shared["scan"] = _scan_body(body)
+            if self._cache is not None:
+                # paragraphs parsed once, for the cache and the whole body alike
+                paragraphs = (_parse_body(p).strip() for p in RE_PARAGRAPHS.split(body))
+                shared["paragraphs"] = [p for p in paragraphs if p]
+                shared["cleaned"] = " ".join(shared["paragraphs"])
+            else:
+                shared["cleaned"] = _parse_body(body, shared["scan"])
+            # use keywords instead
+            if len(shared["cleaned"]):
+                shared["keywords"] = get_keywords(shared["cleaned"]) # _get_bigrams(cleaned)
+            shared["slow"] = (
+                self._max_seconds is not None and monotonic() - started > self._max_seconds
+            )
+        scan, cleaned = shared["scan"], shared["cleaned"]
         if not len(cleaned):
             return {}
 
-        # use keywords instead
-        keywords = get_keywords(cleaned) # _get_bigrams(cleaned)
-        self._analysis["title"] = _analyze_title(title, keywords, self._full)
+        keywords = _copied(shared["keywords"])
+        if shared["slow"]:
+            if self._degrade == "skip":
+                return self._skipped("parse")
+            degraded.append("parse")
+        self._stage("parse", started)
+        self._analysis["title"] = _analyze_title(
+            title, keywords, self._full, cache=self._cache, matcher=self._keywords
+        )
 
         self._analysis["body"] = {}
-        self._analysis["emojis"] = _analyze_emojis(body, self._max_emojis, self._full)
+        if "emojis" not in shared:
+            shared["emojis"] = _analyze_emojis(body, self._max_emojis, self._full, scan=scan)
+        self._analysis["emojis"] = _copied(shared["emojis"])
         if auto_skip:
             if self._full:
                 if (
                     self._analysis["emojis"]["score"] < 0.8
                     or self._analysis["title"]["score"] < 0.8
                 ):
+                    self._outcome = "auto_skip"
                     return {}
             elif self._analysis["emojis"] < 0.8 or self._analysis["title"] < 0.8:
+                self._outcome = "auto_skip"
                 return {}
-        self._analysis["body"] = _analyze_body(cleaned, self._deep, self._full)
-
-        wcount = len(cleaned.split(" "))
-        self._analysis["images"] = _analyze_images(body, wcount, self._full)
-        self._analysis["tagging"] = _analyze_overtagging(
-            body, self._max_user_tags, self._full
-        )
 
         metadata = post["json_metadata"]
         if isinstance(metadata, str):
             metadata = jloads(metadata)
         tags = metadata.get("tags", [])
-        self._analysis["tags"] = _analyze_tags(tags, self._max_tags, self._full)
+        tagged = _analyze_tags(tags, self._max_tags, self._full)
+        if floor is not None:
+            ceiling = self._ceiling(self._analysis["title"], self._analysis["emojis"], tagged)
+            if ceiling < floor:
+                self._outcome = "floor"
+                return {}
+
+        # a slow parse leaves a tighter language stage
+        sample, prefix, deadline = self._sample, None, None
+        if self._max_seconds is not None:
+            deadline = monotonic() + self._max_seconds
+        if "parse" in degraded:
+            sample = sample or self._degrade == "sample"
+            prefix = 1000
+        started = monotonic()
+        if "body" not in shared:
+            paragraphs = None
+            if self._cache is not None and "parse" not in degraded:
+                paragraphs = shared["paragraphs"]
+            shared["body"] = _analyze_body(
+                cleaned,
+                self._deep,
+                self._full,
+                sample=sample,
+                cache=self._cache,
+                paragraphs=paragraphs,
+                deadline=deadline,
+                prefix=prefix,
+            )
+            shared["late"] = deadline is not None and monotonic() >= deadline
+        self._analysis["body"] = _copied(shared["body"])
+        if shared["late"]:
+            if self._degrade == "skip":
+                return self._skipped("language")
+            degraded.append("language")
+        self._stage("language", started)
+
+        if "images" not in shared:
+            wcount = len(cleaned.split(" "))
+            shared["images"] = _analyze_images(body, wcount, self._full, scan=scan)
+            shared["tagging"] = _analyze_overtagging(
+                body, self._max_user_tags, self._full, scan=scan
+            )
+        self._analysis["images"] = _copied(shared["images"])
+        self._analysis["tagging"] = _copied(shared["tagging"])
+
+        self._analysis["tags"] = tagged
 
         score = 0
         if not self._full:
@@ -958,10 +1357,46 @@ class Scrutineer:
 
         self._analysis["deep"] = self._deep
         self._analysis["score"] = score
+        if self._profiles is not None:
+            self._analysis["profiles"] = {
+                profile.name: self._profile_score(profile, scan, tags)
+                for profile in self._profiles.resolve(post, tags)
+            }
+        if budgeted:
+            self._analysis["degraded"] = degraded
+        self._outcome = "scored"
         return self._analysis
 
+    def _profile_score(self, profile, scan, tags):
+        # title, body and images are shared, only the limits and weights differ
+        scores = (
+            _subscore(self._analysis["title"]),
+            _subscore(self._analysis["body"]),
+            _analyze_emojis("", profile.max_emojis, scan=scan),
+            _subscore(self._analysis["images"]),
+            _analyze_overtagging("", profile.max_user_tags, scan=scan),
+            _analyze_tags(tags, profile.max_tags),
+        )
+        score = sum(s * w for s, w in zip(scores, profile.weights))
+        return {"score": score, "passed": score * 100 >= profile.minimum_score}
+
+    def _skipped(self, stage):
+        self._outcome = "budget"
+        self._analysis["degraded"] = [stage]
+        self._analysis["skipped"] = True
+        return self._analysis
 
-def _analyze_title(title, keywords, full=False):
+
+def _copied(result):
+    # shared by every copy of a body, but each analysis owns its results
+    return deepcopy(result) if isinstance(result, dict) else result
+
+
+def _subscore(analysis):
+    return analysis["score"] if isinstance(analysis, dict) else analysis
+
+
+def _analyze_title(title, keywords, full=False, cache=None, matcher=None):
 
     cleaned = title
     cleaned = RE_DASH.sub(" ", cleaned)
@@ -984,15 +1419,17 @@ def _analyze_title(title, keywords, full=False):
         uppercase = len(RE_UPPERCASE.findall(cleaned))/length
         adjust = (1, 0.5)[int(bool(uppercase>0.5))]
         
-        english = _count_english(cleaned, chars=True)
+        english = _count_english(cleaned, chars=True, cache=cache)
         readability = (english / len(title)) * adjust
         
+        words = title.lower()
         if isinstance(keywords, dict):
-            words = title.lower()
             for keyword in keywords:
                 if keyword in words:
                     skeywords = 0.5
                     break
+        if not skeywords and matcher is not None and matcher.search(words):
+            skeywords = 0.5
         score = int(not (bmin or amax)) * (((readability * 9.5) + skeywords) / 10)
 
     if not full:
@@ -1010,7 +1447,13 @@ def _analyze_title(title, keywords, full=False):
         "score": score,
     }
 
-def get_keywords(body, occurrence=4):
+def get_keywords(body, occurrence=4, chunk_size=None):
+    if chunk_size:
+        words = Counter()
+        for cleaned in iter_cleaned(body, chunk_size):
+            words.update(RE_WORD.findall(cleaned))
+        keywords = {w: c for w, c in words.items() if w not in STOP_WORDS}
+        return {k: c for k, c in keywords.items() if c >= int(occurrence)}
     words = RE_WORD.findall(_parse_body(body).lower())
     keywords = {w:words.count(w) for w in set(words) if w not in STOP_WORDS}
     return {k: c for k, c in keywords.items() if c >= int(occurrence)}
@@ -1018,9 +1461,75 @@ def get_keywords(body, occurrence=4):
 def get_bigrams(body, occurrence=4):
     return _get_bigrams(_parse_body(body), occurrence=int(occurrence))
 
-def _parse_body(body):
+def iter_cleaned(body, chunk_size=8192):
+    # clean a body, or any iterable of lines, a few lines at a time
+    carry = max(int(chunk_size) * 16, 65536)
+    lines, size, lead = [], 0, ""
+    for line in _iter_lines(body):
+        if size >= chunk_size and (size >= carry or _splittable(lines, line)):
+            yield _parse_body(lead + "".join(lines))
+            # later chunks keep the newline before them, like in the whole body
+            lines, size, lead = [], 0, "\n"
+        lines.append(line)
+        size += len(line)
+    if lines:
+        yield _parse_body(lead + "".join(lines))
+
+
+def _iter_lines(body):
+    if not isinstance(body, str):
+        yield from body
+        return
+    start = 0
+    while start < len(body):
+        end = body.find("\n", start) + 1 or len(body)
+        yield body[start:end]
+        start = end
+
+
+def _splittable(lines, line):
+    # plain words on both sides, so no pattern can join or span them
+    if not (RE_SAFE_END.search(lines[-1]) and RE_SAFE_START.match(line)):
+        return False
+    chunk = "".join(lines)
+    closing = chunk.rfind(")")
+    return not (
+        chunk.rfind("<") > chunk.rfind(">")
+        or chunk.rfind("[") > chunk.rfind("]")
+        or chunk.rfind("](") > closing
+        or chunk.rfind("![") > closing
+    )
+
+
+def _scan_body(body):
+    # each markup feature found once, with the same patterns the analyzers use
+    scan = {
+        "images": [m.span() for m in RE_IMAGE.finditer(body)],
+        "sequences": len(RE_IMAGES.findall(body)),
+        "mentions": [m.span() for m in RE_USER_TAGS.finditer(body)],
+        "emojis": [],
+    }
+    # emojis are only looked up within non-ascii runs and keycaps
+    for match in RE_EMOJI_RUNS.finditer(body):
+        for emoji in emoji_list(match.group()):
+            emoji["match_start"] += match.start()
+            emoji["match_end"] += match.start()
+            scan["emojis"].append(emoji)
+    return scan
+
+
+def _parse_body(body, scan=None):
     # remove images, replace whitespaces
-    cleaned = RE_IMAGE.sub("", body).lower()
+    if scan is None:
+        cleaned = RE_IMAGE.sub("", body)
+    else:
+        parts, start = [], 0
+        for image_start, image_end in scan["images"]:
+            parts.append(body[start:image_start])
+            start = image_end
+        parts.append(body[start:])
+        cleaned = "".join(parts)
+    cleaned = cleaned.lower()
     cleaned = RE_DELIMITERS.sub(" ", cleaned)
 
     ## remove other formatting codes
@@ -1047,6 +1556,31 @@ def _parse_body(body):
 
     return cleaned
 
+def _truncate_body(body, max_bytes):
+    # cut at the last full line within the budget
+    truncated = body.encode("utf-8")[:max_bytes].decode("utf-8", "ignore")
+    line = truncated.rfind("\n")
+    if line > 0:
+        truncated = truncated[:line]
+    return truncated
+
+
+def _sample_body(body, max_bytes, parts=4):
+    # evenly spaced slices of whole lines, within the budget
+    ratio = len(body) / max(1, len(body.encode("utf-8")))
+    # room for the newlines that join the slices
+    budget = max(0, max_bytes - (parts - 1)) // parts
+    size = int(budget * ratio)
+    step = len(body) / parts
+    slices = []
+    for i in range(parts):
+        start = int(i * step)
+        if start:
+            start = body.find("\n", start) + 1 or start
+        slices.append(_truncate_body(body[start : start + size], budget))
+    return "\n".join(slices)
+
+
 def _get_bigrams(contents, occurrence=4):
     bigrams = {}
     words = RE_WORD.findall(contents.lower())
@@ -1057,9 +1591,21 @@ def _get_bigrams(contents, occurrence=4):
     return {b: o for b, o in bigrams.items() if o >= int(occurrence)}
 
 
-def _analyze_body(words, deep, full=False):
+def _analyze_body(
+    words,
+    deep,
+    full=False,
+    sample=False,
+    cache=None,
+    paragraphs=None,
+    deadline=None,
+    prefix=None,
+):
     length = len(words.split(" "))
-    english = _count_english(words)
+    if cache is not None and paragraphs is not None:
+        english = _count_english_paragraphs(paragraphs, cache, deadline=deadline)
+    else:
+        english = _count_english(words, sample=sample, deadline=deadline, prefix=prefix)
     w400 = english > 400
     w800 = english > 800
     score = (w400 + w800) * (english / length) / 2
@@ -1075,25 +1621,200 @@ def _analyze_body(words, deep, full=False):
     }
 
 
-def _count_english(text, chars=False):
+def _analyze_comment_body(words, full=False, cache=None):
+    length = len(words.split(" "))
+    english = 0
+    if len(words) and length >= COMMENT_MIN_WORDS:
+        english = _count_english(words, cache=cache)
+    score = (english / length) * min(1, english / COMMENT_WORDS)
+
+    if not full:
+        return score
+    return {"cleaned": length, "english": english, "score": score}
+
+
+class LanguageCache:
+    def __init__(self, maxsize=4096):
+        self._maxsize = int(maxsize)
+        self._entries = OrderedDict()
+        # paragraphs seen once, kept only when they come back
+        self._seen = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def detect(self, text):
+        key = _cache_key(text)
+        with self._lock:
+            languages = self._get(key)
+            if languages is not None:
+                return languages
+
+        languages = _detect_languages(text)
+        self._store(key, languages)
+        return languages
+
+    def lookup(self, text):
+        # cached languages, or None for a text not seen before
+        key = _cache_key(text)
+        with self._lock:
+            languages = self._get(key)
+            if languages is not None:
+                return languages
+            if self._seen.pop(key, None) is None:
+                self._seen[key] = True
+                if len(self._seen) > self._maxsize:
+                    self._seen.popitem(last=False)
+                return None
+
+        languages = _detect_languages(text)
+        self._store(key, languages)
+        return languages
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self._maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._seen.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _get(self, key):
+        languages = self._entries.get(key)
+        if languages is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+        return languages
+
+    def _store(self, key, languages):
+        with self._lock:
+            self._entries[key] = languages
+            if len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+
+def _cache_key(text):
+    return blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _count_english(text, chars=False, sample=False, cache=None, deadline=None, prefix=None):
     if not len(text):
         return 0
+    if cache is not None:
+        probability = cache.detect(text).get("en", 0)
+    elif sample and not chars:
+        return _sample_english(text, deadline=deadline)
+    elif prefix and not chars:
+        # detect on the leading words only, extrapolate to the rest
+        words = text.split(" ")
+        return _detect_english(" ".join(words[:prefix])) * len(words)
+    elif deadline is not None and not chars:
+        probability = _detect_english_until(text, deadline)
+        if probability is None:
+            # out of time, estimate from a single sampled chunk
+            return _sample_english(text, minimum=1, maximum=1, deadline=deadline)
+    else:
+        probability = _detect_english(text)
+    if chars:
+        return probability * len(text)
+    return probability * len(text.split(" "))
+
+
+def _count_english_paragraphs(paragraphs, cache, deadline=None):
+    # repeated paragraphs are served from the cache, the rest detected in one call
+    english, rest = 0, []
+    for paragraph in paragraphs:
+        languages = cache.lookup(paragraph)
+        if languages is None:
+            rest.append(paragraph)
+        else:
+            english += languages.get("en", 0) * len(paragraph.split(" "))
+    return english + _count_english(" ".join(rest), deadline=deadline)
+
+
+def _detect_languages(text):
+    counter = _detections.get()
+    if counter is not None:
+        counter[0] += 1
     try:
-        results = str(detect_langs(text))[1:-1].split(",")
+        results = detect_langs(text)
     except Exception as e:
         print(f"Scrutineer: {e}")
-        return 0
-    for lang in results:
-        if "en:" not in lang:
+        return {}
+    return {r.lang: r.prob for r in results}
+
+
+def _detect_english(text):
+    return _detect_languages(text).get("en", 0)
+
+
+def _detect_english_until(text, deadline):
+    # full detection, or None once the deadline passes; a late detection is left to finish
+    result = []
+    # in the caller's context, so the detection is counted with its analysis
+    thread = Thread(
+        target=copy_context().run,
+        args=(lambda: result.append(_detect_english(text)),),
+        name="language",
+        daemon=True,
+    )
+    thread.start()
+    thread.join(max(0, deadline - monotonic()))
+    return result[0] if result else None
+
+
+def preload(freeze=True):
+    # load the models once, before forking workers
+    detector_factory.init_factory()
+    emoji_list("\U0001f642")
+    if freeze:
+        # keep the collector off the shared pages, so they stay copy-on-write
+        gc.freeze()
+
+
+def _sample_english(text, chunk=80, minimum=3, maximum=8, error=0.05, deadline=None):
+    # detect on stratified chunks, stop once the estimate settles
+    words = text.split(" ")
+    length = len(words)
+    strata = max(1, length // chunk)
+    if strata < minimum * 2:
+        return _detect_english(text) * length
+
+    # one random chunk per stratum, visited in random order
+    random = Random(length)
+    size = length / strata
+    order = list(range(strata))
+    random.shuffle(order)
+
+    probabilities = []
+    for stratum in order[:maximum]:
+        start = int(stratum * size) + random.randint(0, max(0, int(size) - chunk))
+        probabilities.append(_detect_english(" ".join(words[start : start + chunk])))
+        count = len(probabilities)
+        if deadline is not None and monotonic() > deadline:
+            break
+        if count < minimum:
             continue
-        if chars:
-            return float(lang.strip()[3:]) * len(text)
-        return float(lang.strip()[3:]) * len(text.split(" "))
-    return 0
+        mean = sum(probabilities) / count
+        variance = sum((p - mean) ** 2 for p in probabilities) / max(1, count - 1)
+        if sqrt(variance / count) <= error:
+            break
+    return (sum(probabilities) / len(probabilities)) * length
 
-def _analyze_emojis(body, limit, full=False):
+def _analyze_emojis(body, limit, full=False, scan=None):
     score = 1
-    emojis = emoji_list(body)
+    emojis = scan["emojis"] if scan is not None else emoji_list(body)
     count = len(emojis)
     if count > limit:
         score = (limit / count) * int(bool(limit))
@@ -1108,10 +1829,14 @@ def _analyze_emojis(body, limit, full=False):
     }
 
 
-def _analyze_images(body, wcount, full=True):
+def _analyze_images(body, wcount, full=True, scan=None):
     score = 0
-    count = len(RE_IMAGE.findall(body))
-    sequences = len(RE_IMAGES.findall(body))
+    if scan is not None:
+        count = len(scan["images"])
+        sequences = scan["sequences"]
+    else:
+        count = len(RE_IMAGE.findall(body))
+        sequences = len(RE_IMAGES.findall(body))
     if count:
         scores = [0]
         for image in (1, 2, 3):
@@ -1128,8 +1853,11 @@ def _analyze_images(body, wcount, full=True):
     return {"count": count, "sequences": sequences, "score": score}
 
 
-def _analyze_overtagging(body, limit, full=False):
-    tags = len(RE_USER_TAGS.findall(body))
+def _analyze_overtagging(body, limit, full=False, scan=None):
+    if scan is not None:
+        tags = len(scan["mentions"])
+    else:
+        tags = len(RE_USER_TAGS.findall(body))
     if tags > limit:
         score = limit / tags
     else:
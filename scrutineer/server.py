@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""
+    scrutineer.server
+    ~~~~~~~~~
+
+    HTTP/JSON scoring service with warm workers and micro-batching.
+
+    :copyright: 2022 Rodney Maniego Jr.
+    :license: MIT License
+"""
+
+import argparse
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps as jdumps
+from json import loads as jloads
+from multiprocessing import get_context
+from queue import Empty, Queue
+from threading import Event, Thread
+from time import monotonic
+
+from langdetect import detect_langs
+
+from .metrics import Metrics
+from .scrutineer import Scrutineer, get_keywords, preload
+
+_analyzer = None
+
+
+def _init_worker(options, weights):
+    global _analyzer
+    _analyzer = Scrutineer(**options)
+    _analyzer.set_weights(**weights)
+    # load the language profiles before the first request
+    detect_langs("warm up the language profiles of this worker")
+
+
+def _ping():
+    return True
+
+
+def _score_batch(items):
+    # a (status, result) pair per item, posts by permlink are fetched as one batch
+    results = [None] * len(items)
+    keyed = {}
+    for index, (kind, payload) in enumerate(items):
+        auto_skip = bool(payload.get("auto_skip", False))
+        if kind == "analyze" and "post" not in payload:
+            keyed.setdefault(auto_skip, []).append(index)
+            continue
+        try:
+            if kind == "keywords":
+                result = get_keywords(payload["body"], occurrence=payload.get("occurrence", 4))
+            else:
+                result = _analyzer.analyze(payload["post"], auto_skip=auto_skip)
+            results[index] = (200, result)
+        except Exception as e:
+            results[index] = _failed(e, inline=True)
+    for auto_skip, indexes in keyed.items():
+        keys = [(items[i][1]["author"], items[i][1]["permlink"]) for i in indexes]
+        try:
+            analyses = [(200, a) for a in _analyzer.analyze_batch(keys, auto_skip=auto_skip)]
+        except Exception as e:
+            analyses = [_failed(e)] * len(indexes)
+        for index, analysis in zip(indexes, analyses):
+            results[index] = analysis
+    return results
+
+
+def _failed(error, inline=False):
+    # a post sent with the request can be malformed, a fetched one can't
+    if inline and isinstance(error, (KeyError, ValueError, TypeError)):
+        return 400, {"error": str(error)}
+    return 502 if isinstance(error, ConnectionError) else 500, {"error": str(error)}
+
+
+def _check(kind, payload):
+    if not isinstance(payload, dict):
+        raise ValueError("payload must be a JSON object.")
+    if kind == "keywords" and not isinstance(payload.get("body"), str):
+        raise ValueError("body must be a string.")
+    if kind == "analyze" and not isinstance(payload.get("post"), dict):
+        if not all(isinstance(payload.get(k), str) for k in ("author", "permlink")):
+            raise ValueError("analyze needs a post, or an author and permlink.")
+
+
+class ScoringServer:
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=8080,
+        workers=2,
+        batch_size=16,
+        batch_window=0.005,
+        weights=None,
+        metrics=None,
+        preloaded=False,
+        **options,
+    ):
+        self._address = (host, int(port))
+        self._workers = int(workers)
+        self._batch_size = max(1, int(batch_size))
+        self._batch_window = float(batch_window)
+        context = None
+        if preloaded:
+            # workers fork from a parent that already holds the models
+            preload()
+            context = get_context("fork")
+        self._executor = ProcessPoolExecutor(
+            self._workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(options, weights or {}),
+        )
+        self._metrics = metrics or Metrics()
+        self._queue = Queue()
+        self._ready = Event()
+        self._stopped = Event()
+        self._httpd = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def metrics(self):
+        return self._metrics
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def submit(self, kind, payload):
+        # resolves to a (status, result) pair
+        future = Future()
+        self._queue.put((kind, payload, future))
+        return future
+
+    def start(self):
+        Thread(target=self._warm, daemon=True).start()
+        Thread(target=self._batch, daemon=True).start()
+        self._httpd = ThreadingHTTPServer(self._address, _handler(self))
+        self._httpd.daemon_threads = True
+        Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def serve_forever(self):
+        self.start()
+        try:
+            self._stopped.wait()
+        except KeyboardInterrupt:
+            pass
+        self.stop()
+
+    def stop(self):
+        self._stopped.set()
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+        self._executor.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _warm(self):
+        # ready once every worker has loaded its models
+        wait([self._executor.submit(_ping) for _ in range(self._workers)])
+        self._ready.set()
+
+    def _batch(self):
+        # group requests arriving within the window into one worker task
+        while not self._stopped.is_set():
+            try:
+                batch = [self._queue.get(timeout=0.1)]
+            except Empty:
+                continue
+            deadline = monotonic() + self._batch_window
+            while len(batch) < self._batch_size:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except Empty:
+                    break
+            self._metrics.inc("scrutineer_batches_total")
+            self._metrics.inc("scrutineer_batched_requests_total", len(batch))
+            task = self._executor.submit(_score_batch, [(k, p) for k, p, _ in batch])
+            task.add_done_callback(lambda t, b=batch: _resolve(t, b))
+
+
+def _resolve(task, batch):
+    try:
+        results = task.result()
+    except Exception as e:
+        for _, _, future in batch:
+            future.set_exception(e)
+        return
+    for (_, _, future), result in zip(batch, results):
+        future.set_result(result)
+
+
+def _handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if self.path == "/healthz":
+                self._respond(200, {"status": "ok"})
+            elif self.path == "/readyz":
+                ready = server.ready
+                self._respond(200 if ready else 503, {"ready": ready})
+            elif self.path == "/metrics":
+                self._respond(200, server.metrics.render(), "text/plain; version=0.0.4")
+            else:
+                self._respond(404, {"error": "not found"})
+
+        def do_POST(self):
+            kinds = {"/analyze": "analyze", "/keywords": "keywords"}
+            if self.path not in kinds:
+                self._respond(404, {"error": "not found"})
+                return
+            started = monotonic()
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = jloads(self.rfile.read(length))
+                _check(kinds[self.path], payload)
+            except ValueError as e:
+                status, result = 400, {"error": str(e)}
+            else:
+                try:
+                    status, result = server.submit(kinds[self.path], payload).result()
+                except Exception as e:
+                    status, result = 500, {"error": str(e)}
+            server.metrics.observe(
+                "scrutineer_request_seconds", monotonic() - started, endpoint=self.path
+            )
+            server.metrics.inc("scrutineer_requests_total", endpoint=self.path, status=status)
+            self._respond(status, result)
+
+        def _respond(self, status, data, content_type="application/json"):
+            if isinstance(data, str):
+                body = data.encode("utf-8")
+            else:
+                body = jdumps(data).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrutineer scoring service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--batch-window", type=float, default=0.005)
+    parser.add_argument("--deep", action="store_true")
+    parser.add_argument("--full", action="store_true")
+    parser.add_argument("--preload", action="store_true")
+    args = parser.parse_args()
+
+    server = ScoringServer(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        batch_window=args.batch_window,
+        deep=args.deep,
+        full=args.full,
+        preloaded=args.preload,
+    )
+    print(f"Scrutineer: serving on {args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
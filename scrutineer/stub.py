@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+    scrutineer.stub
+    ~~~~~~~~~
+
+    Local stub of a Hive API node, for offline checks of the fetch layer.
+
+    :copyright: 2022 Rodney Maniego Jr.
+    :license: MIT License
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps as jdumps
+from json import loads as jloads
+from threading import Thread
+from time import sleep
+
+
+class StubNode:
+    def __init__(
+        self, posts=None, blocks=None, delay=0, fail=False, keep_alive=True, error=None
+    ):
+        self.posts = {(p["author"], p["permlink"]): p for p in (posts or [])}
+        self.blocks = list(blocks or [])
+        self.delay = float(delay)
+        self.fail = bool(fail)
+        # a JSON-RPC error object answered to every call, with HTTP 200
+        self.error = error
+        # without keep-alive the socket is dropped after each response, unannounced
+        self.keep_alive = bool(keep_alive)
+        self.requests = 0
+        self.calls = 0
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = jloads(self.rfile.read(length))
+                node.requests += 1
+                if node.delay:
+                    sleep(node.delay)
+                if node.fail:
+                    self._respond(503, b"")
+                    return
+                if isinstance(payload, list):
+                    data = [node.handle(call) for call in payload]
+                else:
+                    data = node.handle(payload)
+                self._respond(200, jdumps(data).encode("utf-8"))
+                if not node.keep_alive:
+                    self.close_connection = True
+
+            def _respond(self, status, body):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def handle(self, call):
+        self.calls += 1
+        if self.error is not None:
+            return {"jsonrpc": "2.0", "error": self.error, "id": call.get("id")}
+        method, params = call.get("method"), call.get("params") or {}
+        result = None
+        if method == "bridge.get_post":
+            result = self.posts.get((params.get("author"), params.get("permlink")))
+        elif method == "bridge.get_account_posts":
+            result = [
+                p
+                for (author, _), p in reversed(self.posts.items())
+                if author == params.get("account")
+            ][: params.get("limit", 20)]
+        elif method == "bridge.get_discussion":
+            result = self.discussion(params.get("author"), params.get("permlink"))
+        elif method == "block_api.get_block_range":
+            start = params.get("starting_block_num", 1)
+            blocks = self.blocks[start - 1 : start - 1 + params.get("count", 1)]
+            result = {"blocks": blocks}
+        elif method == "block_api.get_block_header" and self.blocks:
+            number = min(max(1, params.get("block_num", 1)), len(self.blocks))
+            result = {"header": {"timestamp": self.blocks[number - 1]["timestamp"]}}
+        elif method == "condenser_api.get_dynamic_global_properties":
+            result = {"head_block_number": len(self.blocks)}
+        if result is None:
+            return {"jsonrpc": "2.0", "error": {"code": -32602}, "id": call.get("id")}
+        return {"jsonrpc": "2.0", "result": result, "id": call.get("id")}
+
+    def discussion(self, author, permlink):
+        if (author, permlink) not in self.posts:
+            return None
+        replies = {}
+        for (a, p), post in self.posts.items():
+            if post.get("parent_author"):
+                parent = f"{post['parent_author']}/{post['parent_permlink']}"
+                replies.setdefault(parent, []).append(f"{a}/{p}")
+        result, keys = {}, [f"{author}/{permlink}"]
+        while keys:
+            key = keys.pop()
+            a, p = key.split("/", 1)
+            result[key] = dict(self.posts[(a, p)], replies=replies.get(key, []))
+            keys.extend(replies.get(key, []))
+        return result
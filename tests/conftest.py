@@ -0,0 +1,30 @@
+import pytest
+from langdetect import DetectorFactory
+
+from scrutineer.stub import StubNode
+
+# langdetect is randomized, scores must repeat between runs
+DetectorFactory.seed = 0
+
+
+def make_post(n, body=None):
+    return {
+        "author": f"author{n}",
+        "permlink": f"post-{n}",
+        "title": f"A simple post about walking along the river, part {n}",
+        "body": body or "We walk along the river and talk about the city today. " * 60,
+        "json_metadata": {"tags": ["walking", "river"]},
+        "url": f"/@author{n}/post-{n}",
+        "created": "2022-05-01T00:00:00",
+    }
+
+
+@pytest.fixture
+def posts():
+    return [make_post(n) for n in range(10)]
+
+
+@pytest.fixture
+def node(posts):
+    with StubNode(posts) as node:
+        yield node
@@ -0,0 +1,71 @@
+from random import Random
+from statistics import mean, variance
+
+import pytest
+
+from scrutineer.aggregate import AuthorAggregator
+
+
+def analyses(count=200, seed=0):
+    random = Random(seed)
+    for n in range(count):
+        body = random.random()
+        # full analyses nest each sub-score in a dict
+        yield {
+            "author": f"author{n % 3}",
+            "title": random.random(),
+            "body": {"score": body} if n % 2 else body,
+            "score": random.random(),
+        }
+
+
+def assert_same(a, b):
+    assert a.authors() == b.authors()
+    for author in a.authors():
+        mine, theirs = a.stats(author), b.stats(author)
+        assert mine.keys() == theirs.keys()
+        for field in mine:
+            assert mine[field] == pytest.approx(theirs[field])
+
+
+def test_merged_halves_match_one_pass():
+    everything = list(analyses())
+    whole, first, second = AuthorAggregator(), AuthorAggregator(), AuthorAggregator()
+    for n, analysis in enumerate(everything):
+        whole.update(analysis)
+        (first if n < 70 else second).update(analysis)
+    assert_same(first.merge(second), whole)
+
+    bodies = [a["body"] for a in everything if a["author"] == "author1"]
+    bodies = [b["score"] if isinstance(b, dict) else b for b in bodies]
+    stats = whole.stats("author1")["body"]
+    assert stats["count"] == len(bodies)
+    assert stats["mean"] == pytest.approx(mean(bodies))
+    assert stats["variance"] == pytest.approx(variance(bodies))
+    assert stats["min"] == min(bodies) and stats["max"] == max(bodies)
+    assert abs(stats["p50"] - sorted(bodies)[len(bodies) // 2]) < 0.05
+
+
+def test_merge_into_an_empty_aggregator():
+    other = AuthorAggregator()
+    for analysis in analyses(20):
+        other.update(analysis)
+    assert_same(AuthorAggregator().merge(other), other)
+    with pytest.raises(ValueError):
+        AuthorAggregator(bins=10).merge(other)
+
+
+def test_save_and_load(tmp_path):
+    aggregator = AuthorAggregator(bins=20)
+    for analysis in analyses(50):
+        aggregator.update(analysis)
+    aggregator.update({})
+    path = tmp_path / "authors.json"
+    aggregator.save(path)
+    loaded = AuthorAggregator.load(path)
+    assert_same(loaded, aggregator)
+    assert loaded.quantile("author0", "score", 0.9) == aggregator.quantile("author0", "score", 0.9)
+    # a loaded snapshot keeps updating and merging
+    loaded.update(next(analyses(1, seed=1)))
+    count = aggregator.stats("author0")["score"]["count"]
+    assert loaded.stats("author0")["score"]["count"] == count + 1
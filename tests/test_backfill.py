@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from scrutineer import Fetcher
+from scrutineer.backfill import Backfill
+from scrutineer.fetch import HTTPTransport, RecordingTransport, ReplayTransport
+from scrutineer.prefilter import Prefilter
+from scrutineer.stub import StubNode
+
+from conftest import make_post
+
+START = datetime(2022, 5, 1)
+BLOCKS = 30
+
+
+def stamp(number):
+    return (START + timedelta(seconds=3 * number)).isoformat()
+
+
+def comment(author, permlink, parent_author=""):
+    value = {"parent_author": parent_author, "author": author, "permlink": permlink}
+    return {"type": "comment_operation", "value": value}
+
+
+@pytest.fixture
+def chain():
+    # post n is created in block 2n + 2, replies fill the odd blocks
+    posts = [dict(make_post(n), created=stamp(2 * n + 2)) for n in range(10)]
+    operations = {2 * n + 2: [comment(p["author"], p["permlink"])] for n, p in enumerate(posts)}
+    for number in range(1, BLOCKS + 1, 2):
+        operations[number] = [comment("replier", f"re-{number}", parent_author="author0")]
+    # edits, within the creating shard and long after it
+    operations[9] = [comment("author3", "post-3")]
+    operations[25] = [comment("author0", "post-0"), comment("author1", "post-1")]
+    blocks = [
+        {
+            "block_id": f"{number:08x}" + "0" * 32,
+            "timestamp": stamp(number),
+            "transactions": [{"operations": operations.get(number, [])}],
+        }
+        for number in range(1, BLOCKS + 1)
+    ]
+    with StubNode(posts, blocks) as node:
+        yield node
+
+
+def run(node, directory, **kwargs):
+    fetcher = kwargs.pop("fetcher", None) or Fetcher(HTTPTransport([node.url]))
+    options = dict(fetcher=fetcher, shard_size=10, batch_size=4, workers=1)
+    backfill = Backfill(1, BLOCKS + 1, directory, **dict(options, **kwargs))
+    backfill.run()
+    return backfill
+
+
+def rows(backfill):
+    return [(r["block"], r["analysis"]["author"]) for r in backfill.results()]
+
+
+def test_each_post_once_in_its_creating_block(chain, tmp_path):
+    backfill = run(chain, tmp_path)
+    assert rows(backfill) == [(2 * n + 2, f"author{n}") for n in range(10)]
+    assert backfill.progress() == 1
+
+
+def test_listed_authors_are_left_out(chain, tmp_path):
+    # their posts are not fetched, an edit would pass for a new post
+    backfill = run(chain, tmp_path, prefilter=Prefilter(deny=["author0", "author3"]))
+    expected = [(2 * n + 2, f"author{n}") for n in range(10) if n not in (0, 3)]
+    assert rows(backfill) == expected
+
+
+def test_results_stop_at_the_checkpoint(chain, tmp_path):
+    backfill = run(chain, tmp_path)
+    expected = rows(backfill)
+    # a batch written after the last checkpoint, then a crash
+    with open(tmp_path / "shard-1-11.jsonl", "ab") as f:
+        f.write(b'{"block": 10, "analysis": {"author": "partial"')
+    assert rows(backfill) == expected
+
+
+def test_resume_after_crash(chain, tmp_path, monkeypatch):
+    expected = rows(run(chain, tmp_path / "clean"))
+
+    from scrutineer.backfill import Scrutineer
+
+    analyze_batch, calls = Scrutineer.analyze_batch, []
+
+    def crash(self, *args, **kwargs):
+        calls.append(1)
+        if len(calls) == 3:
+            raise RuntimeError("crash")
+        return analyze_batch(self, *args, **kwargs)
+
+    monkeypatch.setattr(Scrutineer, "analyze_batch", crash)
+    with pytest.raises(RuntimeError):
+        run(chain, tmp_path / "crashed")
+    backfill = Backfill(1, BLOCKS + 1, tmp_path / "crashed", shard_size=10)
+    assert 0 < backfill.progress() < 1
+
+    monkeypatch.setattr(Scrutineer, "analyze_batch", analyze_batch)
+    backfill = run(chain, tmp_path / "crashed")
+    assert rows(backfill) == expected
+    # a finished job runs again without writing anything
+    run(chain, tmp_path / "crashed")
+    assert rows(backfill) == expected
+
+
+def test_replayed_fixture_matches_the_live_run(chain, tmp_path):
+    path = tmp_path / "fixture.jsonl.gz"
+    with RecordingTransport(HTTPTransport([chain.url]), path) as recorder:
+        live = run(chain, tmp_path / "live", fetcher=Fetcher(recorder))
+    chain.stop()
+
+    fetcher = Fetcher(ReplayTransport(path, strict=True))
+    replayed = run(chain, tmp_path / "replayed", fetcher=fetcher, workers=2)
+    assert list(replayed.results()) == list(live.results())
+
+
+def test_between_resolves_blocks_by_time(chain, tmp_path):
+    fetcher = Fetcher(HTTPTransport([chain.url]))
+    backfill = Backfill.between(stamp(5), stamp(21), tmp_path, fetcher=fetcher, shard_size=10)
+    assert backfill.shards() == [(5, 15), (15, 21)]
@@ -0,0 +1,73 @@
+from threading import enumerate as threads
+from time import monotonic, sleep
+
+import pytest
+
+import scrutineer.scrutineer as core
+from scrutineer import Scrutineer
+from scrutineer.scrutineer import _sample_body
+
+from conftest import make_post
+
+MIXED = "".join(
+    "We walk along the river and talk about the city today, with friends.\n\n"
+    if n % 3
+    else "Caminamos por el río y hablamos de la ciudad con los amigos hoy.\n\n"
+    for n in range(300)
+)
+LONG = "We walk along the river and talk about the city today.\n\n" * 1500
+
+
+@pytest.fixture(autouse=True)
+def late_detections():
+    # detections past the deadline run on, finish them before the next test
+    yield
+    for thread in threads():
+        if thread.name == "language":
+            thread.join()
+
+
+def slow_detection(monkeypatch, seconds_per_char):
+    detect = core._detect_english
+
+    def slow(text):
+        sleep(len(text) * seconds_per_char)
+        return detect(text)
+
+    monkeypatch.setattr(core, "_detect_english", slow)
+
+
+def test_time_budget_bounds_language_detection(monkeypatch):
+    # detection costs grow with the text, about 0.4s for the whole body
+    slow_detection(monkeypatch, 5e-6)
+    post = make_post(0, LONG)
+    unbounded = Scrutineer().analyze(post)
+    started = monotonic()
+    bounded = Scrutineer(max_seconds=0.1).analyze(post)
+    assert monotonic() - started < 0.2
+    assert bounded["degraded"] == ["language"]
+    assert abs(bounded["body"] - unbounded["body"]) < 0.05
+
+
+def test_unexhausted_budget_keeps_full_detection():
+    post = make_post(0, MIXED)
+    unbounded = Scrutineer(full=True).analyze(post)
+    bounded = Scrutineer(full=True, max_seconds=60).analyze(post)
+    assert bounded.pop("degraded") == []
+    assert bounded == unbounded
+
+
+def test_skip_policy_applies_to_a_late_language_stage(monkeypatch):
+    # parsing a short body is quick, only the language stage runs late
+    slow_detection(monkeypatch, 1e-4)
+    analyzer = Scrutineer(max_seconds=0.02, degrade="skip")
+    analysis = analyzer.analyze(make_post(0))
+    assert analyzer.outcome == "budget"
+    assert analysis["skipped"]
+    assert analysis["degraded"] == ["language"]
+
+
+def test_sample_body_stays_within_budget():
+    body = "one long line without breaks " * 200
+    for max_bytes in (100, 257, 4096):
+        assert len(_sample_body(body, max_bytes).encode("utf-8")) <= max_bytes
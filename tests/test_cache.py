@@ -0,0 +1,54 @@
+from random import Random
+
+import scrutineer.scrutineer as core
+from scrutineer import LanguageCache, Scrutineer
+
+from conftest import make_post
+
+FOOTER = "Thanks for reading, follow me for more walks around the city and the river."
+WORDS = (
+    "today we walked along the river market garden harbour station library "
+    "and talked about friends family weather coffee music books trees with"
+).split()
+
+
+def post(n, paragraphs=60):
+    # every paragraph its own, but for a shared footer
+    random = Random(n)
+    body = "\n\n".join(
+        [" ".join(random.choice(WORDS) for _ in range(15)) + "." for _ in range(paragraphs)]
+        + [FOOTER]
+    )
+    return dict(make_post(n, body=body), title=f"A walk to the river and the market, part {n}")
+
+
+def count_detections(monkeypatch):
+    calls = []
+    detect_langs = core.detect_langs
+    monkeypatch.setattr(core, "detect_langs", lambda text: calls.append(text) or detect_langs(text))
+    return calls
+
+
+def test_cached_scores_stay_close():
+    posts = [post(n) for n in range(6)]
+    uncached = [Scrutineer(full=True).analyze(p) for p in posts]
+    analyzer = Scrutineer(full=True, cache=LanguageCache())
+    cached = [analyzer.analyze(p) for p in posts]
+    for a, b in zip(uncached, cached):
+        assert abs(a["body"]["score"] - b["body"]["score"]) < 0.02
+        assert abs(a["score"] - b["score"]) < 0.01
+
+
+def test_repeated_paragraphs_are_cached(monkeypatch):
+    calls = count_detections(monkeypatch)
+    cache = LanguageCache()
+    analyzer = Scrutineer(cache=cache)
+    for n in range(3):
+        analyzer.analyze(post(n))
+    # the footer is kept when it comes back, and served from then on
+    assert cache.stats()["hits"] == 1
+    calls.clear()
+    analyzer.analyze(post(3))
+    # the title, then every paragraph not seen before in a single call
+    assert len(calls) == 2
+    assert FOOTER.lower().rstrip(".") not in calls[1]
@@ -0,0 +1,37 @@
+import pytest
+
+from scrutineer.scrutineer import RE_WORD, _parse_body, get_keywords, iter_cleaned
+
+PROSE = "We walk along the river and talk about the city today.\n"
+LINKS = "See [the old map](https://example.com/maps/old\nriver) and https://example.com/a b.\n"
+HTML = '<div class="note\nwide">\ninside the div\n</div>\n<img src="x.png"\nalt="photo">\n'
+FENCE = "```python\nprint('walk')\n```\nafter the fence\n"
+IMAGE = "![a photo of the\nriver](https://example.com/river.png)\n"
+TABLE = "| city | river |\n|---|---|\n| old | wide |\n"
+MENTIONS = "Thanks @alice and\n@bob-the.walker for the walk!\n"
+
+
+def bodies():
+    parts = [PROSE * 3, LINKS, HTML, FENCE, IMAGE, TABLE, MENTIONS, "# Heading\n\n> quoted\n"]
+    yield "".join(parts)
+    yield "".join(parts[::-1]) * 3
+    yield "".join(p for part in parts for p in (part, PROSE)).rstrip("\n")
+    yield PROSE * 200
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 40, 256, 8192])
+@pytest.mark.parametrize("body", list(bodies()))
+def test_chunks_give_the_same_tokens(body, chunk_size):
+    chunked = [w for c in iter_cleaned(body, chunk_size) for w in RE_WORD.findall(c)]
+    assert chunked == RE_WORD.findall(_parse_body(body))
+
+
+@pytest.mark.parametrize("body", list(bodies()))
+def test_chunked_keywords_match(body):
+    assert get_keywords(body, chunk_size=40) == get_keywords(body)
+
+
+def test_lines_from_an_iterable():
+    body = next(bodies())
+    lines = body.splitlines(keepends=True)
+    assert list(iter_cleaned(iter(lines), 40)) == list(iter_cleaned(body, 40))
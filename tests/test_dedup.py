@@ -0,0 +1,49 @@
+import scrutineer.scrutineer as core
+from scrutineer import Scrutineer
+
+from conftest import make_post
+
+EMOJI_BODY = "We walk along the river 🌊 and talk about the city today 🙂.\n\n" * 60
+
+
+def copies():
+    # cross-posts: one body under several authors and titles
+    posts = [make_post(n) for n in range(3)] + [make_post(n, EMOJI_BODY) for n in range(3, 6)]
+    posts[1]["title"] = "The city by the river, seen on foot"
+    return posts
+
+
+def count_scans(monkeypatch):
+    scans = []
+    scan_body = core._scan_body
+    monkeypatch.setattr(core, "_scan_body", lambda body: scans.append(body) or scan_body(body))
+    return scans
+
+
+def test_batch_matches_single_analyses(monkeypatch):
+    posts = copies()
+    single = [Scrutineer(full=True).analyze(p) for p in posts]
+    scans = count_scans(monkeypatch)
+    batch = Scrutineer(full=True).analyze_batch(posts)
+    assert batch == single
+    assert len(scans) == 2
+
+
+def test_copies_own_their_results():
+    batch = Scrutineer(full=True).analyze_batch(copies())
+    batch[3]["emojis"]["emojis"].append("🙃")
+    batch[3]["body"]["score"] = 0
+    assert batch[4]["emojis"]["emojis"] == batch[5]["emojis"]["emojis"]
+    assert batch[4]["emojis"]["emojis"] != batch[3]["emojis"]["emojis"]
+    assert batch[4]["body"]["score"] > 0
+
+
+def test_batch_within_a_stream_keeps_its_copies(monkeypatch):
+    scans = count_scans(monkeypatch)
+    analyzer = Scrutineer()
+    stream = analyzer.analyze_stream(copies()[:2])
+    next(stream)
+    analyzer.analyze_batch([make_post(9, EMOJI_BODY)])
+    scans.clear()
+    next(stream)
+    assert scans == []
@@ -0,0 +1,34 @@
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from scrutineer.export import ArrowSink
+
+
+def scored(n):
+    return {"author": f"author{n}", "permlink": f"post-{n}", "deep": 0, "score": 0.5}
+
+
+def test_fields_first_seen_in_later_chunks_are_kept(tmp_path):
+    path = tmp_path / "analyses.parquet"
+    skipped = {"author": "a", "permlink": "p", "degraded": ["bytes"], "skipped": True}
+    listed = {"author": "b", "permlink": "q", "prefilter": "deny", "skipped": True}
+    profiled = dict(scored(3), node="http://node", profiles={"writing": {"score": 0.4, "passed": False}})
+    with ArrowSink(path, chunk_size=2) as sink:
+        sink.write_batch([scored(0), scored(1), skipped, listed, profiled])
+
+    rows = pq.read_table(path).to_pylist()
+    assert len(rows) == 5
+    assert rows[2]["skipped"] is True and rows[2]["degraded"] == ["bytes"]
+    assert rows[2]["score"] is None
+    assert rows[3]["prefilter"] == "deny"
+    assert rows[4]["node"] == "http://node"
+    assert '"writing"' in rows[4]["profiles"]
+
+
+def test_unknown_columns_after_the_first_chunk_raise(tmp_path):
+    sink = ArrowSink(tmp_path / "analyses.arrow", format="arrow", chunk_size=1)
+    sink.write(scored(0))
+    with pytest.raises(ValueError):
+        sink.write(dict(scored(1), surprise=1))
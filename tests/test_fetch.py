@@ -0,0 +1,40 @@
+from scrutineer import Fetcher, Scrutineer
+from scrutineer.fetch import HTTPTransport
+
+
+def test_get_posts_batches_calls(node, posts):
+    fetcher = Fetcher(HTTPTransport([node.url]), batch_size=4)
+    keys = [(p["author"], p["permlink"]) for p in posts]
+    fetched = fetcher.get_posts(keys + [("nobody", "missing")])
+    assert [p.get("permlink") for p in fetched[:-1]] == [p["permlink"] for p in posts]
+    assert fetched[-1] == {}
+    assert node.calls == 11
+    assert node.requests == 3
+
+
+def test_get_blogs_one_batch(node, posts):
+    fetcher = Fetcher(HTTPTransport([node.url]))
+    blogs = fetcher.get_blogs([p["author"] for p in posts[:3]], limit=2)
+    assert list(blogs) == ["author0", "author1", "author2"]
+    assert blogs["author1"][0]["permlink"] == "post-1"
+    assert node.requests == 1
+
+
+def test_connections_are_pooled(node, posts):
+    transport = HTTPTransport([node.url], pool_size=1)
+    fetcher = Fetcher(transport)
+    for post in posts[:3]:
+        fetcher.get_post(post["author"], post["permlink"])
+    pool = transport._pools[node.url]
+    assert pool.qsize() == 1
+
+
+def test_analyze_batch_matches_analyze(node, posts):
+    analyzer = Scrutineer(fetcher=Fetcher(HTTPTransport([node.url])))
+    keys = [(p["author"], p["permlink"]) for p in posts[:3]]
+    batch = analyzer.analyze_batch(keys)
+    requests = node.requests
+    single = [analyzer.analyze(*key) for key in keys]
+    assert node.requests == requests + 3
+    assert [a["permlink"] for a in batch] == [a["permlink"] for a in single]
+    assert [round(a["score"], 2) for a in batch] == [round(a["score"], 2) for a in single]
@@ -0,0 +1,46 @@
+from random import Random
+
+import pytest
+
+from scrutineer import Scrutineer
+from scrutineer.matcher import KeywordMatcher, _bounded
+
+from conftest import make_post
+
+KEYWORDS = ["he", "she", "his", "hers", "a", "aa", "aaa", "ah", "h"]
+
+
+def brute_force(keywords, text, words):
+    text = text.lower()
+    return sorted(
+        (start, start + len(k), k)
+        for k in dict.fromkeys(k.lower() for k in keywords)
+        for start in range(len(text))
+        if text.startswith(k, start) and (not words or _bounded(text, start, start + len(k)))
+    )
+
+
+@pytest.mark.parametrize("words", [True, False])
+def test_finditer_matches_brute_force(words):
+    matcher = KeywordMatcher(KEYWORDS + ["HE"], words=words)
+    random = Random(0)
+    for _ in range(300):
+        text = "".join(random.choice("ahers _.") for _ in range(random.randint(0, 40)))
+        assert sorted(matcher.finditer(text)) == brute_force(KEYWORDS, text, words)
+
+
+def test_overlapping_hits():
+    matcher = KeywordMatcher(["she", "he", "hers"], words=False)
+    assert sorted(matcher.finditer("ushers")) == [(1, 4, "she"), (2, 4, "he"), (2, 6, "hers")]
+    assert matcher.findall("ushers") == ["she", "he", "hers"]
+    assert KeywordMatcher(["she", "he", "hers"]).search("ushers") is None
+
+
+@pytest.mark.parametrize(
+    "keywords, score", [(["walk"], 0), (["light"], 0), (["lighthouse"], 0.5), (["at night"], 0.5)]
+)
+def test_title_keywords_on_whole_words(keywords, score):
+    body = "Cooking dinner with fresh vegetables from the garden market.\n\n" * 60
+    post = dict(make_post(0, body), title="Walking to the lighthouse at night, alone")
+    analysis = Scrutineer(full=True, keywords=keywords).analyze(post)
+    assert analysis["title"]["keyword_score"] == score
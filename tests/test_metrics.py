@@ -0,0 +1,88 @@
+from threading import Thread
+
+import scrutineer.scrutineer as core
+from scrutineer import Fetcher, Scrutineer
+from scrutineer.fetch import HTTPTransport
+from scrutineer.metrics import Metrics
+from scrutineer.stub import StubNode
+
+from conftest import make_post
+
+DETECTIONS = "scrutineer_language_detections_total"
+
+
+def counter(metrics, name, **labels):
+    return metrics.snapshot()["counters"].get((name, tuple(sorted(labels.items()))), 0)
+
+
+def count_detections(monkeypatch):
+    calls = []
+    detect_langs = core.detect_langs
+    monkeypatch.setattr(core, "detect_langs", lambda text: calls.append(text) or detect_langs(text))
+    return calls
+
+
+def test_render_in_prometheus_format():
+    metrics = Metrics(buckets=(0.1, 1))
+    metrics.inc("requests_total", endpoint="/analyze", status=200)
+    metrics.inc("requests_total", 2, endpoint="/analyze", status=200)
+    metrics.observe("stage_seconds", 0.05, stage='say "hi"')
+    metrics.observe("stage_seconds", 0.5, stage='say "hi"')
+    metrics.add_collector(lambda: {"cache_size": 3})
+    assert metrics.render().splitlines() == [
+        "# TYPE requests_total counter",
+        'requests_total{endpoint="/analyze",status="200"} 3',
+        "# TYPE stage_seconds histogram",
+        'stage_seconds_bucket{stage="say \\"hi\\"",le="0.1"} 1',
+        'stage_seconds_bucket{stage="say \\"hi\\"",le="1"} 2',
+        'stage_seconds_bucket{stage="say \\"hi\\"",le="+Inf"} 2',
+        'stage_seconds_sum{stage="say \\"hi\\""} 0.55',
+        'stage_seconds_count{stage="say \\"hi\\""} 2',
+        "# TYPE cache_size gauge",
+        "cache_size 3",
+    ]
+
+
+def test_callback_sees_every_observation():
+    seen = []
+    metrics = Metrics(callback=lambda name, value, labels: seen.append((name, value, labels)))
+    Scrutineer(metrics=metrics).analyze(make_post(0))
+    names = {name for name, _, _ in seen}
+    assert {"scrutineer_posts_total", "scrutineer_stage_seconds", DETECTIONS} <= names
+    assert ("scrutineer_posts_total", 1, {"result": "scored"}) in seen
+
+
+def test_detections_are_counted_per_analyzer(monkeypatch):
+    calls = count_detections(monkeypatch)
+    Scrutineer().analyze(make_post(0))
+    expected = len(calls)
+
+    analyzers = [Scrutineer(metrics=Metrics()) for _ in range(4)]
+    threads = [
+        Thread(target=lambda a=a: [a.analyze(make_post(n)) for n in range(3)]) for a in analyzers
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for analyzer in analyzers:
+        assert counter(analyzer._metrics, DETECTIONS) == 3 * expected
+
+
+def test_thread_replies_are_counted(monkeypatch):
+    root = make_post(0)
+    replies = [
+        dict(
+            make_post(n, body=f"Thanks for sharing walk {'one two three'.split()[n - 1]} today."),
+            parent_author="author0",
+            parent_permlink="post-0",
+            depth=1,
+        )
+        for n in range(1, 4)
+    ]
+    calls = count_detections(monkeypatch)
+    metrics = Metrics()
+    with StubNode([root] + replies) as node:
+        analyzer = Scrutineer(metrics=metrics, fetcher=Fetcher(HTTPTransport([node.url])))
+        analyzer.analyze_thread("author0", "post-0")
+    assert counter(metrics, DETECTIONS) == len(calls) == 5
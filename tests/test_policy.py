@@ -0,0 +1,101 @@
+from http.client import HTTPException
+from time import monotonic
+
+import pytest
+
+from scrutineer import Fetcher, Scrutineer
+from scrutineer.fetch import FetchPolicy, HTTPTransport, _unpack
+from scrutineer.stub import StubNode
+
+
+def test_hedges_a_slow_node(posts):
+    with StubNode(posts, delay=0.5) as slow, StubNode(posts) as fast:
+        policy = FetchPolicy([slow.url, fast.url], hedge_after=0.05)
+        fetcher = Fetcher(HTTPTransport(policy=policy))
+        started = monotonic()
+        post = fetcher.get_post("author0", "post-0")
+        assert monotonic() - started < 0.4
+        assert post["permlink"] == "post-0"
+        assert fetcher.served[("author0", "post-0")] == fast.url
+        assert policy.stats()[fast.url]["hedged"] == 1
+
+
+def test_fails_over_and_opens_the_breaker(posts):
+    with StubNode(posts, fail=True) as failing, StubNode(posts) as healthy:
+        policy = FetchPolicy([failing.url, healthy.url], hedge=False, failures=2)
+        fetcher = Fetcher(HTTPTransport(policy=policy, retries=1))
+        for _ in range(3):
+            assert fetcher.get_post("author0", "post-0")["permlink"] == "post-0"
+        stats = policy.stats()
+        assert stats[failing.url]["open"]
+        assert stats[failing.url]["errors"] == 2
+        assert stats[healthy.url]["served"] == 3
+        # the open breaker keeps the failing node out of the rotation
+        assert failing.requests == 2
+
+
+def test_raises_when_every_node_fails(posts):
+    with StubNode(posts, fail=True) as failing:
+        fetcher = Fetcher(HTTPTransport([failing.url], retries=1))
+        with pytest.raises(ConnectionError):
+            fetcher.get_post("author0", "post-0")
+        # the only node is retried rather than given up on
+        assert failing.requests == 2
+
+
+def test_rpc_errors_fail_over(posts):
+    locked = {"code": -32000, "message": "lock timeout"}
+    with StubNode(posts, error=locked) as erroring, StubNode(posts) as healthy:
+        policy = FetchPolicy([erroring.url, healthy.url], hedge=False)
+        fetcher = Fetcher(HTTPTransport(policy=policy))
+        assert fetcher.get_post("author0", "post-0")["permlink"] == "post-0"
+        assert policy.stats()[erroring.url]["errors"] == 1
+        assert fetcher.served[("author0", "post-0")] == healthy.url
+
+
+def test_missing_posts_are_not_node_errors(node):
+    policy = FetchPolicy([node.url], hedge=False)
+    fetcher = Fetcher(HTTPTransport(policy=policy))
+    assert fetcher.get_posts([("nobody", "missing")] * 2) == [{}, {}]
+    assert policy.stats()[node.url]["errors"] == 0
+
+
+def test_unpack_rejects_batch_errors():
+    error = {"code": -32603, "message": "rate limited"}
+    with pytest.raises(HTTPException):
+        _unpack({"jsonrpc": "2.0", "error": error, "id": None}, 2)
+    with pytest.raises(HTTPException):
+        _unpack([{"error": error, "id": 0}, {"error": error, "id": 1}], 2)
+    partial = [{"error": error, "id": 0}, {"result": {"permlink": "p"}, "id": 1}]
+    assert _unpack(partial, 2) == [None, {"permlink": "p"}]
+
+
+def test_scrutineer_retries_reach_the_transport(posts):
+    with StubNode(posts, fail=True) as failing:
+        analyzer = Scrutineer(retries=3, policy=FetchPolicy([failing.url], hedge=False))
+        with pytest.raises(ConnectionError):
+            analyzer.analyze("author0", "post-0")
+        assert failing.requests == 4
+
+        fetcher = Fetcher(HTTPTransport([failing.url], retries=0))
+        with pytest.raises(ConnectionError):
+            fetcher.get_post("author0", "post-0", retries=2)
+        assert failing.requests == 7
+
+
+def test_retries_stale_keep_alive_sockets(posts):
+    with StubNode(posts, keep_alive=False) as node:
+        transport = HTTPTransport([node.url])
+        fetcher = Fetcher(transport)
+        for post in posts[:3]:
+            assert fetcher.get_post(post["author"], post["permlink"])["title"]
+        stats = transport.policy.stats()[node.url]
+        assert stats["errors"] == 0
+        assert stats["served"] == 3
+
+
+def test_reports_the_serving_node(node, posts):
+    policy = FetchPolicy([node.url], hedge=False)
+    analyzer = Scrutineer(full=True, policy=policy)
+    analysis = analyzer.analyze("author0", "post-0")
+    assert analysis["node"] == node.url
@@ -0,0 +1,76 @@
+import os
+import pickle
+from threading import Event
+
+from scrutineer.prefilter import Prefilter
+
+
+def write(path, names, stamp):
+    path.write_text("\n".join(names) + "\n", encoding="utf-8")
+    os.utime(path, ns=(stamp, stamp))
+
+
+def test_refresh_picks_up_changes(tmp_path):
+    path = tmp_path / "deny.txt"
+    write(path, ["spammer"], 1_000_000_000)
+    prefilter = Prefilter(deny=str(path), watch=0.001)
+    assert prefilter.check("spammer") == "deny"
+
+    write(path, ["@Other"], 2_000_000_000)
+    prefilter._checked -= 1
+    prefilter.check("spammer")
+    prefilter._thread.join()
+    assert prefilter.check("spammer") is None
+    assert prefilter.check("other") == "deny"
+
+
+def test_missing_file_keeps_previous_lists(tmp_path):
+    path = tmp_path / "deny.txt"
+    write(path, ["spammer"], 1_000_000_000)
+    prefilter = Prefilter(deny=str(path), watch=0.001)
+
+    # rotated away, the next one not written yet
+    os.remove(path)
+    prefilter._checked -= 1
+    assert prefilter.check("spammer") == "deny"
+    prefilter._thread.join()
+    assert prefilter.check("spammer") == "deny"
+
+    write(path, ["other"], 2_000_000_000)
+    prefilter._refresh()
+    assert prefilter.check("spammer") is None
+    assert prefilter.check("other") == "deny"
+
+
+def test_check_does_not_wait_for_the_build(tmp_path):
+    path = tmp_path / "deny.txt"
+    write(path, ["spammer"], 1_000_000_000)
+    prefilter = Prefilter(deny=str(path), watch=0.001)
+    started, release = Event(), Event()
+    build = prefilter._build
+
+    def slow_build(source):
+        started.set()
+        release.wait(5)
+        return build(source)
+
+    prefilter._build = slow_build
+    write(path, ["other"], 2_000_000_000)
+    prefilter._checked -= 1
+    assert prefilter.check("spammer") == "deny"
+    assert started.wait(5)
+    # the old lists answer while the new ones are built
+    assert prefilter.check("spammer") == "deny"
+    release.set()
+    prefilter._thread.join()
+    assert prefilter.check("other") == "deny"
+
+
+def test_pickles_with_watcher(tmp_path):
+    path = tmp_path / "deny.txt"
+    write(path, ["spammer"], 1_000_000_000)
+    prefilter = Prefilter(deny=str(path), watch=0.001)
+    prefilter._checked -= 1
+    prefilter.check("spammer")
+    copy = pickle.loads(pickle.dumps(prefilter))
+    assert copy.check("spammer") == "deny"
@@ -0,0 +1,63 @@
+import pytest
+
+from scrutineer import Scrutineer
+from scrutineer.profiles import WEIGHTS, Profile, Profiles
+
+from conftest import make_post
+
+BODY = (
+    "We walk along the river 🌊 and talk about the city today with @alice and @bob 🙂.\n"
+    "![river](https://example.com/river.png)\n\n"
+) * 40
+
+PROFILES = [
+    Profile("photography", communities=["hive-194913"], weights={"images": 3}, max_emojis=5),
+    Profile("writing", tags=["walking"], weights={"body": 3, "tags": 0}, minimum_score=60),
+    Profile("strict", tags=["river"], max_emojis=0, max_user_tags=1, max_tags=1),
+]
+
+
+def test_profile_scores_match_dedicated_analyzers():
+    post = dict(make_post(0, BODY), community="hive-194913")
+    analysis = Scrutineer(profiles=PROFILES).analyze(post)
+    assert set(analysis["profiles"]) == {"photography", "writing", "strict"}
+    scores = []
+    for profile in PROFILES:
+        analyzer = Scrutineer(
+            minimum_score=profile.minimum_score,
+            max_emojis=profile.max_emojis,
+            max_user_tags=profile.max_user_tags,
+            max_tags=profile.max_tags,
+        )
+        analyzer.set_weights(**dict(zip(WEIGHTS, profile.weights)))
+        expected = analyzer.analyze(post)["score"]
+        scored = analysis["profiles"][profile.name]
+        scores.append(expected)
+        assert scored["score"] == pytest.approx(expected)
+        assert scored["passed"] == (expected * 100 >= profile.minimum_score)
+    assert len(set(scores)) == len(scores)
+
+
+def test_resolve_by_community_tag_and_default():
+    profiles = Profiles(PROFILES + [Profile("general")], default="general")
+
+    def resolve(tags=(), **post):
+        return [p.name for p in profiles.resolve(post, tags)]
+
+    assert resolve(community="HIVE-194913") == ["photography"]
+    assert resolve(category="hive-194913", tags=["River"]) == ["photography", "strict"]
+    assert resolve(tags=["walking", "river"]) == ["writing", "strict"]
+    assert resolve(tags=["cooking"]) == ["general"]
+    # tags are read from json_metadata when not given
+    post = {"json_metadata": '{"tags": ["walking"]}'}
+    assert [p.name for p in profiles.resolve(post)] == ["writing"]
+    assert Profiles(PROFILES).resolve({"community": "hive-1"}, []) == []
+
+
+def test_invalid_profiles():
+    with pytest.raises(ValueError):
+        Profiles([Profile("a"), Profile("a")])
+    with pytest.raises(ValueError):
+        Profiles([Profile("a")], default="b")
+    with pytest.raises(ValueError):
+        Profile("a", weights={"length": 2})
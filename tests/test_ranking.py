@@ -0,0 +1,57 @@
+import scrutineer.scrutineer as core
+from scrutineer import Scrutineer
+from scrutineer.ranking import Leaderboard
+
+from conftest import make_post
+
+
+def scored(n, score):
+    return {"permlink": f"post-{n}", "score": score, "body": {"score": 1 - score}}
+
+
+def test_keeps_the_top_n():
+    board = Leaderboard(size=3)
+    offered = [board.offer("hive-1", scored(n, n / 10), timestamp=n) for n in range(1, 10)]
+    assert offered == [True] * 9
+    assert board.offer("hive-1", scored(0, 0.5), timestamp=10) is False
+    assert [a["score"] for a in board.top("hive-1", now=10)] == [0.9, 0.8, 0.7]
+    assert board.threshold("hive-1", now=10) == 0.7
+    assert board.threshold("hive-2", now=10) is None
+    assert board.offer("hive-1", {}) is False
+
+
+def test_ranks_by_a_sub_score():
+    board = Leaderboard(size=2, field="body")
+    for n in range(1, 5):
+        board.offer("hive-1", scored(n, n / 10), timestamp=n)
+    assert [a["permlink"] for a in board.top("hive-1", now=5)] == ["post-1", "post-2"]
+
+
+def test_window_evicts_old_posts():
+    board = Leaderboard(size=2, window=100)
+    board.offer("hive-1", scored(1, 0.9), timestamp=0)
+    board.offer("hive-1", scored(2, 0.5), timestamp=50)
+    # the old best leaves the window, a weaker post now gets in
+    assert board.offer("hive-1", scored(3, 0.4), timestamp=120) is True
+    assert [a["permlink"] for a in board.top("hive-1", now=120)] == ["post-2", "post-3"]
+    assert board.top("hive-1", now=300) == []
+
+
+def test_floor_rejects_before_language_detection(monkeypatch):
+    analyzer = Scrutineer()
+    board = Leaderboard(size=1)
+    best = dict(make_post(0), community="hive-1")
+    assert board.analyze(analyzer, best)["score"] == board.threshold("hive-1", 1e12)
+
+    detections = []
+    detect = core._detect_english
+    monkeypatch.setattr(core, "_detect_english", lambda t: detections.append(t) or detect(t))
+    # emojis in the title and body cap the score below the first place
+    body = "We walk 🙂 along the river 🌊 today.\n" * 200
+    poor = dict(make_post(1, body), community="hive-1")
+    poor["title"] = "🙂 walking 🌊"
+    assert board.analyze(analyzer, poor) == {}
+    assert analyzer.outcome == "floor"
+    assert board.rejected == 1
+    assert detections == []
+    assert [a["author"] for a in board.top("hive-1", 1e12)] == ["author0"]
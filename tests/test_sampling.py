@@ -0,0 +1,69 @@
+from random import Random
+
+import pytest
+
+import scrutineer.scrutineer as core
+from scrutineer import Scrutineer
+from scrutineer.scrutineer import _sample_english
+
+from conftest import make_post
+
+ENGLISH = "we walk along the river and talk about the city and the old market today"
+SPANISH = "caminamos por el río y hablamos de la ciudad y del viejo mercado hoy día"
+
+
+def count_detections(monkeypatch):
+    calls = []
+    detect = core._detect_english
+    monkeypatch.setattr(core, "_detect_english", lambda text: calls.append(text) or detect(text))
+    return calls
+
+
+def mixed(words, english=0.75, block=240, seed=0):
+    # blocks of one language, in a known share of english
+    random = Random(seed)
+    blocks = []
+    while len(blocks) * block < words:
+        sentence = ENGLISH if random.random() < english else SPANISH
+        blocks.append(" ".join([sentence] * (block // 15)))
+    return " ".join(blocks)
+
+
+def test_short_bodies_use_full_detection(monkeypatch):
+    calls = count_detections(monkeypatch)
+    text = mixed(300)
+    assert _sample_english(text) == core._detect_english(text) * len(text.split(" "))
+    assert calls == [text, text]
+
+    # under six chunks of 80 words
+    post = make_post(0, (ENGLISH + ".\n") * 30)
+    analysis = Scrutineer(sample=True).analyze(post)
+    assert analysis["body"] > 0
+    assert analysis == Scrutineer().analyze(post)
+
+
+def test_settled_estimate_stops_early(monkeypatch):
+    calls = count_detections(monkeypatch)
+    text = " ".join([ENGLISH] * 400)
+    length = len(text.split(" "))
+    estimate = _sample_english(text)
+    # every chunk agrees, three are enough
+    assert len(calls) == 3
+    assert all(len(call.split(" ")) == 80 for call in calls)
+    assert estimate / length == pytest.approx(core._detect_english(text), abs=0.05)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_mixed_estimate_within_bounds(monkeypatch, seed):
+    calls = count_detections(monkeypatch)
+    text = mixed(6000, seed=seed)
+    estimate = _sample_english(text) / len(text.split(" "))
+    assert 3 <= len(calls) <= 8
+    probabilities = [core._detect_english(call) for call in calls]
+    count = len(probabilities)
+    mean = sum(probabilities) / count
+    assert estimate == pytest.approx(mean)
+    if count < 8:
+        # stopped early only once the standard error settled
+        variance = sum((p - mean) ** 2 for p in probabilities) / (count - 1)
+        assert (variance / count) ** 0.5 <= 0.05
@@ -0,0 +1,39 @@
+import pytest
+from emoji import emoji_list
+
+from scrutineer.scrutineer import (
+    RE_IMAGE,
+    RE_IMAGES,
+    RE_USER_TAGS,
+    _analyze_emojis,
+    _analyze_images,
+    _analyze_overtagging,
+    _parse_body,
+    _scan_body,
+)
+
+BODIES = [
+    "![@alice pic](u) thanks @bob!",
+    "see https://x.com/?u=@alice&z ok",
+    "![😀](u)",
+    "http://example.com/![a](b)",
+    "![a](b) ![c](d)\n\n@carl @d.e-f (@yes) /@no 👍🏽 🇵🇭 #️⃣ ```code``` |a|b|",
+]
+
+
+@pytest.mark.parametrize("body", BODIES)
+def test_scan_matches_the_original_patterns(body):
+    scan = _scan_body(body)
+    assert len(scan["images"]) == len(RE_IMAGE.findall(body))
+    assert scan["sequences"] == len(RE_IMAGES.findall(body))
+    assert len(scan["mentions"]) == len(RE_USER_TAGS.findall(body))
+    assert [e["emoji"] for e in scan["emojis"]] == [e["emoji"] for e in emoji_list(body)]
+    assert _parse_body(body, scan) == _parse_body(body)
+
+
+@pytest.mark.parametrize("body", BODIES)
+def test_scores_are_unchanged_by_the_scan(body):
+    scan = _scan_body(body)
+    assert _analyze_emojis(body, 2, scan=scan) == _analyze_emojis(body, 2)
+    assert _analyze_overtagging(body, 1, scan=scan) == _analyze_overtagging(body, 1)
+    assert _analyze_images(body, 100, full=False, scan=scan) == _analyze_images(body, 100, full=False)
@@ -0,0 +1,26 @@
+import pytest
+
+from scrutineer import Scrutineer
+from scrutineer.schedule import Scheduler, _chunks
+
+from conftest import make_post
+
+
+def batch():
+    # long and short bodies, copies, and a missing post
+    posts = [make_post(n, "We talk about the city today. " * (20 + 40 * (n % 4))) for n in range(8)]
+    posts += [make_post(8, posts[1]["body"]), make_post(9, posts[2]["body"]), {}]
+    return posts
+
+
+@pytest.mark.parametrize("workers, chunk_cost", [(1, None), (2, None), (2, 1)])
+def test_map_matches_analyze_batch(workers, chunk_cost):
+    posts = batch()
+    expected = Scrutineer(full=True).analyze_batch(posts)
+    with Scheduler(workers=workers, chunk_cost=chunk_cost, full=True) as scheduler:
+        assert scheduler.map(posts) == expected
+
+
+def test_chunks_keep_the_longest_first():
+    tasks = [(9, ["a"]), (5, ["b", "c"]), (3, ["d"]), (2, ["e"]), (1, ["f"])]
+    assert list(_chunks(tasks, 5)) == [["a"], ["b", "c"], ["d", "e"], ["f"]]
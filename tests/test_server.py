@@ -0,0 +1,80 @@
+from http.client import HTTPConnection
+from json import dumps as jdumps
+from json import loads as jloads
+from time import monotonic, sleep
+from urllib.parse import urlsplit
+
+import pytest
+
+from scrutineer.fetch import FetchPolicy
+from scrutineer.server import ScoringServer
+from scrutineer.stub import StubNode
+
+from conftest import make_post
+
+
+def request(server, method, path, payload=None):
+    connection = HTTPConnection(urlsplit(server.url).netloc, timeout=30)
+    body = None if payload is None else jdumps(payload)
+    connection.request(method, path, body=body, headers={"Content-Type": "application/json"})
+    response = connection.getresponse()
+    data = response.read().decode("utf-8")
+    connection.close()
+    return response.status, data
+
+
+def serve(node, **options):
+    policy = FetchPolicy([node.url], hedge=False)
+    server = ScoringServer(port=0, workers=1, policy=policy, retries=0, **options).start()
+    started = monotonic()
+    while request(server, "GET", "/readyz")[0] != 200:
+        assert monotonic() - started < 30
+        sleep(0.05)
+    return server
+
+
+@pytest.fixture
+def server(node):
+    server = serve(node, batch_window=0.2)
+    yield server
+    server.stop()
+
+
+def test_scores_and_reports_metrics(server, node):
+    status, data = request(server, "POST", "/analyze", {"post": make_post(0)})
+    assert status == 200 and jloads(data)["score"] > 0
+    status, data = request(server, "POST", "/analyze", {"author": "author1", "permlink": "post-1"})
+    assert status == 200 and jloads(data)["permlink"] == "post-1"
+
+    status, data = request(server, "GET", "/metrics")
+    assert status == 200
+    assert 'scrutineer_requests_total{endpoint="/analyze",status="200"} 2' in data
+
+
+def test_micro_batch_fetches_together(server, node):
+    keys = [{"author": f"author{n}", "permlink": f"post-{n}"} for n in range(3)]
+    futures = [server.submit("analyze", key) for key in keys]
+    results = [future.result(timeout=30) for future in futures]
+    assert [status for status, _ in results] == [200] * 3
+    assert [analysis["author"] for _, analysis in results] == ["author0", "author1", "author2"]
+    assert node.requests == 1
+
+
+def test_invalid_requests_are_client_errors(server):
+    assert request(server, "POST", "/analyze", {"author": "author0"})[0] == 400
+    assert request(server, "POST", "/keywords", ["not", "an", "object"])[0] == 400
+    post = make_post(0)
+    del post["title"]
+    assert request(server, "POST", "/analyze", {"post": post})[0] == 400
+
+
+def test_node_outages_are_server_errors(posts):
+    with StubNode(posts, fail=True) as failing:
+        server = serve(failing)
+        try:
+            key = {"author": "author0", "permlink": "post-0"}
+            status, data = request(server, "POST", "/analyze", key)
+            assert status == 502
+            assert "error" in jloads(data)
+        finally:
+            server.stop()
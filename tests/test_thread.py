@@ -0,0 +1,64 @@
+import scrutineer.scrutineer as core
+from scrutineer import Fetcher, Scrutineer
+from scrutineer.fetch import HTTPTransport
+from scrutineer.prefilter import Prefilter
+from scrutineer.stub import StubNode
+
+from conftest import make_post
+
+
+def reply(n, parent, depth):
+    body = f"Thanks for sharing this walk, reply number {n} from me. "
+    return dict(
+        make_post(100 + n, body=body),
+        parent_author=parent["author"],
+        parent_permlink=parent["permlink"],
+        depth=depth,
+    )
+
+
+def thread_posts():
+    root = make_post(0)
+    first = reply(1, root, 1)
+    return [root, first, reply(2, first, 2), reply(3, root, 1)]
+
+
+def test_thread_analyzes_every_reply():
+    with StubNode(thread_posts()) as node:
+        analyzer = Scrutineer(fetcher=Fetcher(HTTPTransport([node.url])))
+        thread = analyzer.analyze_thread("author0", "post-0")
+    assert "score" in thread["post"]
+    assert [c["author"] for c in thread["comments"]] == ["author101", "author102", "author103"]
+    assert thread["thread"]["comments"] == 3
+    assert thread["thread"]["depth"] == 2
+
+
+def test_listed_root_keeps_the_thread_shape():
+    with StubNode(thread_posts()) as node:
+        analyzer = Scrutineer(
+            fetcher=Fetcher(HTTPTransport([node.url])),
+            prefilter=Prefilter(deny=["author0"]),
+        )
+        thread = analyzer.analyze_thread("author0", "post-0")
+        assert node.requests == 0
+    assert thread["post"]["prefilter"] == "deny"
+    assert thread["comments"] == []
+    assert thread["thread"] == {"comments": 0, "authors": 0, "depth": 0, "score": 0}
+
+
+def test_thread_within_a_stream_keeps_its_copies(monkeypatch):
+    scans = []
+    scan_body = core._scan_body
+    monkeypatch.setattr(core, "_scan_body", lambda body: scans.append(body) or scan_body(body))
+    body = "A different walk, this time through the old market streets. " * 60
+    copies = [make_post(1, body=body), make_post(2, body=body)]
+
+    with StubNode(thread_posts()) as node:
+        analyzer = Scrutineer(fetcher=Fetcher(HTTPTransport([node.url])))
+        stream = analyzer.analyze_stream(copies)
+        next(stream)
+        analyzer.analyze_thread("author0", "post-0")
+        scans.clear()
+        next(stream)
+    # the copy still reuses the body analyzed before the thread
+    assert scans == []
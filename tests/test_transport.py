@@ -0,0 +1,41 @@
+from time import monotonic
+
+import pytest
+
+from scrutineer import Fetcher, Scrutineer
+from scrutineer.fetch import HTTPTransport, LatencyTransport, RecordingTransport, ReplayTransport
+
+
+def record(node, posts, path):
+    keys = [(p["author"], p["permlink"]) for p in posts]
+    with RecordingTransport(HTTPTransport([node.url]), path) as recorder:
+        analyses = Scrutineer(fetcher=Fetcher(recorder)).analyze_batch(keys)
+    return keys, analyses
+
+
+def test_replay_serves_recording_offline(node, posts, tmp_path):
+    path = tmp_path / "fixture.jsonl.gz"
+    keys, recorded = record(node, posts[:3], path)
+    node.stop()
+
+    analyzer = Scrutineer(fetcher=Fetcher(ReplayTransport(path, strict=True)))
+    replayed = analyzer.analyze_batch(keys)
+    assert [a["score"] for a in replayed] == [a["score"] for a in recorded]
+
+
+def test_strict_replay_rejects_unrecorded_calls(node, posts, tmp_path):
+    path = tmp_path / "fixture.jsonl.gz"
+    record(node, posts[:1], path)
+    fetcher = Fetcher(ReplayTransport(path, strict=True))
+    with pytest.raises(KeyError):
+        fetcher.get_post("nobody", "missing")
+    assert Fetcher(ReplayTransport(path)).get_post("nobody", "missing") == {}
+
+
+def test_latency_is_injected_per_batch(node, posts, tmp_path):
+    path = tmp_path / "fixture.jsonl.gz"
+    keys, _ = record(node, posts, path)
+    fetcher = Fetcher(LatencyTransport(ReplayTransport(path), latency=0.05), batch_size=5)
+    started = monotonic()
+    fetcher.get_posts(keys)
+    assert 0.1 <= monotonic() - started < 0.5